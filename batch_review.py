@@ -0,0 +1,231 @@
+# batch_review.py
+"""
+Grade a whole class of exam submissions.
+
+Input is JSONL with one submission per line:
+    {"id": "student-42", "questions": [{"question": ..., "model_answer": ...,
+                                        "student_answer": ..., "marks": 5}, ...]}
+
+Results are appended to the output JSONL as each window of submissions
+finishes, so an interrupted run resumes by skipping ids already written.
+
+    python batch_review.py submissions.jsonl results.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Set, Tuple
+from paper_reviewer import ExamPaperReviewer
+from token_counter import get_token_counter
+from config import Config
+
+_ANSWER_HEADER = re.compile(r'^\s*#*\s*ANSWER\s+(\d+)\s*$', re.IGNORECASE | re.MULTILINE)
+
+class BatchReviewer:
+    def __init__(self, reviewer: ExamPaperReviewer = None, pack_answers: bool = True):
+        self.reviewer = reviewer or ExamPaperReviewer()
+        self.pack_answers = pack_answers
+        self.logger = logging.getLogger(__name__)
+
+    def review_file(self, input_path: str, output_path: str, window: int = None) -> Dict[str, int]:
+        """Grade every submission in input_path not already present in output_path"""
+        window = window or Config.BATCH_REVIEW_WINDOW
+        done = self._completed_ids(output_path)
+        self._terminate_last_line(output_path)
+        stats = {"graded": 0, "skipped": 0, "failed": 0}
+
+        with open(output_path, 'a', encoding='utf-8') as out:
+            batch = []
+            for submission in self._read_submissions(input_path):
+                if str(submission.get('id')) in done:
+                    stats["skipped"] += 1
+                    continue
+                batch.append(submission)
+                if len(batch) >= window:
+                    self._write_window(out, batch, stats)
+                    batch = []
+            if batch:
+                self._write_window(out, batch, stats)
+
+        return stats
+
+    def review_submissions(self, submissions: List[Dict]) -> List[Dict]:
+        """Grade a window of submissions, packing answers to the same question together"""
+        answers: List[Tuple[int, int, Dict]] = []
+        for s_idx, submission in enumerate(submissions):
+            for q_idx, q in enumerate(submission.get('questions', [])):
+                answers.append((s_idx, q_idx, q))
+
+        graded: Dict[Tuple[int, int], Dict] = {}
+        groups: Dict[Tuple[str, str, int], List[Tuple[int, int, Dict]]] = {}
+        for s_idx, q_idx, q in answers:
+            cached = self.reviewer.cached_grade(q)
+            if cached is not None:
+                graded[(s_idx, q_idx)] = cached
+                continue
+            key = (q.get('question', ''), q.get('model_answer', ''), q.get('marks', 1))
+            groups.setdefault(key, []).append((s_idx, q_idx, q))
+
+        jobs = []
+        for group in groups.values():
+            if self.pack_answers:
+                jobs.extend(self._pack(group))
+            else:
+                jobs.extend([entry] for entry in group)
+
+        with ThreadPoolExecutor(max_workers=Config.REVIEW_MAX_WORKERS) as executor:
+            for job_results in executor.map(self._grade_job, jobs):
+                graded.update(job_results)
+
+        results = []
+        for s_idx, submission in enumerate(submissions):
+            questions = submission.get('questions', [])
+            question_results = [graded[(s_idx, q_idx)] for q_idx in range(len(questions))]
+            results.append({
+                "id": submission.get('id'),
+                "result": self.reviewer.aggregate_results(questions, question_results)
+            })
+        return results
+
+    def _write_window(self, out, batch: List[Dict], stats: Dict[str, int]):
+        for record in self.review_submissions(batch):
+            failed = record["result"]["failed_questions"]
+            if failed:
+                stats["failed"] += 1
+                # Leave partially failed submissions out of the checkpoint so a rerun retries them
+                self.logger.warning(f"Submission {record['id']} had {failed} failed questions")
+                continue
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            stats["graded"] += 1
+        out.flush()
+
+    def _pack(self, group: List[Tuple[int, int, Dict]]) -> List[List[Tuple[int, int, Dict]]]:
+        """Split one question's answers into prompts that fit the context window"""
+        question = group[0][2]
+        base_tokens = self._estimate_tokens(Config.EXAM_BATCH_REVIEW_TEMPLATE.format(
+            question=question.get('question', ''),
+            sample_solution=question.get('model_answer', ''),
+            answers=''
+        ))
+        # The completion shares the window: reasoning first, then one review per answer
+        budget = Config.MAX_CONTEXT_WINDOW * Config.SAFETY_MARGIN - Config.LLM_REASONING_TOKENS
+
+        jobs = []
+        current = []
+        current_tokens = base_tokens
+        for entry in group:
+            answer_tokens = (self._estimate_tokens(entry[2].get('student_answer', ''))
+                             + Config.BATCH_REVIEW_OUTPUT_TOKENS_PER_ANSWER)
+            if current and (current_tokens + answer_tokens > budget
+                            or len(current) >= Config.BATCH_REVIEW_MAX_ANSWERS_PER_PROMPT):
+                jobs.append(current)
+                current = []
+                current_tokens = base_tokens
+            current.append(entry)
+            current_tokens += answer_tokens
+        if current:
+            jobs.append(current)
+        return jobs
+
+    def _grade_job(self, job: List[Tuple[int, int, Dict]]) -> Dict[Tuple[int, int], Dict]:
+        if len(job) == 1:
+            s_idx, q_idx, q = job[0]
+            return {(s_idx, q_idx): self.reviewer.review_paper_question(q)}
+
+        question = job[0][2]
+        max_marks = question.get('marks', 1)
+        answers = "\n\n".join(
+            f"Student Answer {n}:\n{q.get('student_answer', '')}"
+            for n, (_, _, q) in enumerate(job, 1)
+        )
+        prompt = Config.EXAM_BATCH_REVIEW_TEMPLATE.format(
+            question=question.get('question', ''),
+            sample_solution=question.get('model_answer', ''),
+            answers=answers
+        )
+
+        sections = {}
+        try:
+            response = self.reviewer.call_llm(
+                prompt,
+                max_tokens=Config.LLM_REASONING_TOKENS + Config.BATCH_REVIEW_OUTPUT_TOKENS_PER_ANSWER * len(job)
+            )
+            sections = self._split_sections(response)
+        except Exception as e:
+            self.logger.warning(f"Packed review of {len(job)} answers failed: {str(e)}")
+
+        results = {}
+        for n, (s_idx, q_idx, q) in enumerate(job, 1):
+            if n in sections:
+                result = self.reviewer.parse_question_response(sections[n], max_marks)
+                self.reviewer.cache[self.reviewer.batch_cache_key(q)] = result
+            else:
+                # The model skipped or mangled this answer; grade it on its own
+                result = self.reviewer.review_paper_question(q)
+            results[(s_idx, q_idx)] = result
+        return results
+
+    @staticmethod
+    def _split_sections(response: str) -> Dict[int, str]:
+        headers = list(_ANSWER_HEADER.finditer(response))
+        sections = {}
+        for i, header in enumerate(headers):
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(response)
+            sections[int(header.group(1))] = response[header.end():end].strip()
+        return sections
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        return get_token_counter().count(text)
+
+    @staticmethod
+    def _read_submissions(input_path: str) -> Iterator[Dict]:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    @staticmethod
+    def _completed_ids(output_path: str) -> Set[str]:
+        done = set()
+        if not os.path.exists(output_path):
+            return done
+        with open(output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    done.add(str(json.loads(line)["id"]))
+                except (ValueError, KeyError):
+                    # A line cut short by an interruption; its submission is graded again
+                    continue
+        return done
+
+    @staticmethod
+    def _terminate_last_line(output_path: str):
+        """Make sure appended records don't run into a line cut short by an interruption"""
+        if not os.path.exists(output_path) or not os.path.getsize(output_path):
+            return
+        with open(output_path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade a JSONL file of exam submissions")
+    parser.add_argument("input", help="JSONL file with one submission per line")
+    parser.add_argument("output", help="JSONL file results are appended to (also the resume checkpoint)")
+    parser.add_argument("--window", type=int, default=Config.BATCH_REVIEW_WINDOW,
+                        help="Submissions graded together before results are written")
+    parser.add_argument("--no-pack", action="store_true",
+                        help="Grade every answer in its own LLM call")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stats = BatchReviewer(pack_answers=not args.no_pack).review_file(args.input, args.output, args.window)
+    print(f"Graded {stats['graded']} submissions, skipped {stats['skipped']} already graded, "
+          f"{stats['failed']} left for retry")
+
+if __name__ == "__main__":
+    main()
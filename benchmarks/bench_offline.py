@@ -0,0 +1,228 @@
+# benchmarks/bench_offline.py
+"""
+End-to-end benchmark that needs no network: synthetic textbook PDFs, the
+local vector index in a scratch directory, and a fake OpenAI-compatible LLM
+server with fixed latency and error rate. Reports ingest throughput,
+question-generation latency percentiles and grading throughput.
+
+    python -m benchmarks.bench_offline [--books 3] [--requests 20] [--latency-ms 200] [--json out.json]
+
+Embeddings come from a deterministic hashing encoder unless --real-model is
+given, so the numbers track the pipeline rather than the download cache.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.fake_llm_server import FakeLLMServer
+
+class HashingEncoder:
+    """Stand-in for SentenceTransformer: hashed bag of words, L2-normalized"""
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                bucket = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "little")
+                matrix[row, bucket % self.dimension] += 1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        return matrix[0] if single else matrix
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "mean": 0.0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"p50": float(p50), "p90": float(p90), "p99": float(p99), "mean": float(np.mean(values))}
+
+def bench_ingest(args, pages: int) -> dict:
+    from chapter_store import ChapterStore
+    from config import Config
+    from embeddings_manager import EmbeddingsManager
+    from ingest_pipeline import IngestPipeline
+
+    em = EmbeddingsManager.shared()
+    if not args.real_model:
+        em._model = HashingEncoder(Config.EMBEDDING_DIMENSION)
+    store = ChapterStore()
+
+    start = time.perf_counter()
+    stats = IngestPipeline(em, store, force=True).run(Config.DATA_FOLDER)
+    elapsed = time.perf_counter() - start
+    chunks = stats["new_chunks"] + stats["existing_chunks"]
+
+    texts = [
+        chunk
+        for book in em.catalog.books()
+        for chapter in em.catalog.chapters(book)
+        for chunk in store.get_chunks(book, chapter)
+    ]
+    start = time.perf_counter()
+    em.encode_chunks(texts)
+    encode_elapsed = time.perf_counter() - start
+
+    return {
+        "books": stats["books"],
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "pages_per_sec": pages / elapsed if elapsed else 0.0,
+        "chunks_per_sec": chunks / elapsed if elapsed else 0.0,
+        "embeddings_per_sec": len(texts) / encode_elapsed if encode_elapsed else 0.0
+    }
+
+def bench_generation(args, rng: random.Random) -> dict:
+    from config import Config
+    from generate_q import QuestionGeneratorApp
+
+    # Measure generation, not question bank hits from earlier iterations
+    Config.QUESTION_BANK_ENABLED = False
+    app = QuestionGeneratorApp()
+    targets = [
+        (book, chapter.split()[-1])
+        for book in app.retriever.embeddings_manager.catalog.books()
+        for chapter in app.retriever.embeddings_manager.catalog.chapters(book)
+    ]
+    if not targets:
+        raise RuntimeError("Nothing was ingested, so there is nothing to generate questions from")
+
+    latencies, failures = [], 0
+    for i in range(args.requests):
+        book, chapter = rng.choice(targets)
+        question_type = "mcq" if i % 2 == 0 else "written"
+        # Every other request is personalized and so goes through focused retrieval
+        weaknesses = [f"Confuses osmosis with {rng.choice(['diffusion', 'respiration', 'evaporation'])}"] if i % 4 < 2 else None
+        # Measure the LLM path, not the response cache
+        app.generator.cache.clear()
+        start = time.perf_counter()
+        result = app.generate_questions(book, chapter, question_type, args.questions, weaknesses=weaknesses)
+        latencies.append(time.perf_counter() - start)
+        failures += not result["success"]
+
+    return {"requests": args.requests, "failures": failures, **percentiles(latencies),
+            "max_workers": Config.MAX_WORKERS}
+
+def bench_grading(args, rng: random.Random, workdir: str) -> dict:
+    from batch_review import BatchReviewer
+
+    questions = [
+        {"question": f"Explain how {topic} works.", "model_answer": f"{topic.capitalize()} moves energy within the system.", "marks": 5}
+        for topic in ("osmosis", "photosynthesis", "momentum", "refraction")
+    ]
+    phrases = ["moves energy", "is a process", "happens in cells", "needs light", "depends on mass", "bends light"]
+    input_path = os.path.join(workdir, "submissions.jsonl")
+    output_path = os.path.join(workdir, "graded.jsonl")
+    with open(input_path, "w", encoding="utf-8") as f:
+        for s in range(args.students):
+            answers = [dict(q, student_answer=f"{q['question'].split()[2]} {rng.choice(phrases)} (student {s})")
+                       for q in questions]
+            f.write(json.dumps({"id": f"student-{s}", "questions": answers}) + "\n")
+
+    reviewer = BatchReviewer()
+    reviewer.reviewer.cache.clear()
+    start = time.perf_counter()
+    stats = reviewer.review_file(input_path, output_path)
+    elapsed = time.perf_counter() - start
+    return {
+        **stats,
+        "seconds": elapsed,
+        "submissions_per_sec": args.students / elapsed if elapsed else 0.0,
+        "answers_per_sec": args.students * len(questions) / elapsed if elapsed else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark with a fake LLM and local index")
+    parser.add_argument("--books", type=int, default=3)
+    parser.add_argument("--chapters", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=8, help="Pages per chapter")
+    parser.add_argument("--requests", type=int, default=20, help="Question generation requests")
+    parser.add_argument("--questions", type=int, default=10, help="Questions per request")
+    parser.add_argument("--students", type=int, default=50, help="Submissions to grade")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--retry-base-delay", type=float, default=0.1,
+                        help="Overrides LLM_RETRY_BASE_DELAY so injected errors don't dominate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--real-model", action="store_true", help="Use the configured SentenceTransformer")
+    parser.add_argument("--workdir", help="Scratch directory (default: a new temp dir, removed afterwards)")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+
+    server = FakeLLMServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                           error_rate=args.error_rate, seed=args.seed)
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="learnbuddy-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    cwd = os.getcwd()
+
+    # Config reads the environment at import time, so project modules are only imported below
+    os.environ.update({
+        "OPENROUTER_BASE_URL": server.start(),
+        "OPENROUTER_API_KEY": "offline-benchmark",
+        "HF_HUB_OFFLINE": "1",
+        "LLM_REQUESTS_PER_MINUTE": "0",
+        "LLM_TOKENS_PER_MINUTE": "0",
+        "VECTOR_BACKEND": "local",
+        "LOCAL_INDEX_PATH": os.path.join(workdir, ".vector_index"),
+        "TELEMETRY_PORT": "0"
+    })
+    os.environ.pop("TELEMETRY_JSONL_PATH", None)
+    # All other stores and caches use relative paths
+    os.chdir(workdir)
+    try:
+        from benchmarks.synthetic_pdfs import make_textbooks
+        from config import Config
+        Config.LLM_RETRY_BASE_DELAY = args.retry_base_delay
+
+        rng = random.Random(args.seed)
+        pages = make_textbooks(Config.DATA_FOLDER, args.books, args.chapters, args.pages, args.seed)
+        results = {
+            "ingest": bench_ingest(args, pages),
+            "generation": bench_generation(args, rng),
+            "grading": bench_grading(args, rng, workdir),
+            "llm_server": dict(server.stats)
+        }
+    finally:
+        os.chdir(cwd)
+        server.stop()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    ingest, generation, grading = results["ingest"], results["generation"], results["grading"]
+    print(f"\n{'stage':<12} {'metric':<22} {'value':>10}")
+    print(f"{'ingest':<12} {'pages/s':<22} {ingest['pages_per_sec']:>10.1f}")
+    print(f"{'ingest':<12} {'chunks/s':<22} {ingest['chunks_per_sec']:>10.1f}")
+    print(f"{'ingest':<12} {'embeddings/s':<22} {ingest['embeddings_per_sec']:>10.1f}")
+    for name in ("p50", "p90", "p99", "mean"):
+        print(f"{'generation':<12} {'latency ' + name + ' s':<22} {generation[name]:>10.3f}")
+    print(f"{'generation':<12} {'failed requests':<22} {generation['failures']:>10}")
+    print(f"{'grading':<12} {'submissions/s':<22} {grading['submissions_per_sec']:>10.2f}")
+    print(f"{'grading':<12} {'answers/s':<22} {grading['answers_per_sec']:>10.2f}")
+    print(f"{'grading':<12} {'failed submissions':<22} {grading['failed']:>10}")
+    print(f"{'llm server':<12} {'requests (errors)':<22} "
+          f"{str(results['llm_server']['requests']) + ' (' + str(results['llm_server']['errors']) + ')':>10}")
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
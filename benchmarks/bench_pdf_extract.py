@@ -0,0 +1,53 @@
+# benchmarks/bench_pdf_extract.py
+"""
+Compare PDF text extraction backends on the textbooks in Config.DATA_FOLDER.
+
+    python -m benchmarks.bench_pdf_extract [--data-folder ./data] [--workers 8]
+"""
+import argparse
+import time
+from pdf_extractors import EXTRACTORS, extract_pages
+from pdf_processor import PDFProcessor
+from config import Config
+
+def bench_backend(name: str, pdf_paths: list, workers: int) -> dict:
+    pages = 0
+    chars = 0
+    start = time.perf_counter()
+    for pdf_path in pdf_paths:
+        texts = extract_pages(pdf_path, extractor=name, workers=workers)
+        pages += len(texts)
+        chars += sum(len(text) for text in texts)
+    elapsed = time.perf_counter() - start
+    return {
+        "pages": pages,
+        "chars": chars,
+        "seconds": elapsed,
+        "pages_per_sec": pages / elapsed if elapsed else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction backends")
+    parser.add_argument("--data-folder", default=Config.DATA_FOLDER)
+    parser.add_argument("--workers", type=int, default=Config.PDF_EXTRACT_WORKERS,
+                        help="Worker processes for page-range parallelism")
+    parser.add_argument("--backends", nargs="+", default=list(EXTRACTORS))
+    args = parser.parse_args()
+
+    pdf_paths = PDFProcessor.list_pdfs(args.data_folder)
+    if not pdf_paths:
+        print(f"No PDFs found in {args.data_folder}")
+        return
+
+    print(f"{'backend':<12} {'workers':>7} {'pages':>7} {'seconds':>9} {'pages/s':>9}")
+    for name in args.backends:
+        if not EXTRACTORS[name].is_available():
+            print(f"{name:<12} not installed")
+            continue
+        for workers in sorted({1, args.workers}):
+            result = bench_backend(name, pdf_paths, workers)
+            print(f"{name:<12} {workers:>7} {result['pages']:>7} "
+                  f"{result['seconds']:>9.2f} {result['pages_per_sec']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_startup.py
+"""
+Measure cold-start cost of the entry points: import time and object
+construction time, each in a fresh interpreter, and whether torch /
+sentence_transformers ended up loaded.
+
+    python -m benchmarks.bench_startup [--repeat 5] [--targets generate_q ingest]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# module to import, and the construction a run of it pays for before doing work
+TARGETS = {
+    "generate_q": ("generate_q", "module.QuestionGeneratorApp()"),
+    "review_cli": ("review_cli", "module.ExamPaperReviewer()"),
+    "ingest": ("ingest", "module.EmbeddingsManager.shared(); module.ChapterStore()"),
+    # What the lazy paths avoid: loading the embedding model itself
+    "embedding_model": ("embeddings_manager", "module.EmbeddingsManager.shared().model"),
+}
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module} as module
+imported = time.perf_counter()
+{init}
+ready = time.perf_counter()
+try:
+    import resource
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+except ImportError:
+    max_rss_mb = None
+print(json.dumps({{
+    "import": imported - start,
+    "init": ready - imported,
+    "torch": "torch" in sys.modules,
+    "sentence_transformers": "sentence_transformers" in sys.modules,
+    "max_rss_mb": max_rss_mb
+}}))
+"""
+
+def run_probe(module: str, init: str) -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, init=init)],
+        cwd=root, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "probe failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import and initialization time of the entry points")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS), choices=list(TARGETS))
+    args = parser.parse_args()
+
+    print(f"{'target':<16} {'import s':>9} {'init s':>9} {'total s':>9} {'rss MB':>8} {'torch':>6}")
+    for name in args.targets:
+        module, init = TARGETS[name]
+        try:
+            runs = [run_probe(module, init) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{name:<16} failed: {str(e)}")
+            continue
+        import_s = statistics.median(run["import"] for run in runs)
+        init_s = statistics.median(run["init"] for run in runs)
+        total_s = statistics.median(run["import"] + run["init"] for run in runs)
+        rss = runs[-1]["max_rss_mb"]
+        rss_text = f"{rss:>8.0f}" if rss is not None else f"{'n/a':>8}"
+        print(f"{name:<16} {import_s:>9.3f} {init_s:>9.3f} {total_s:>9.3f} {rss_text} "
+              f"{'yes' if runs[-1]['torch'] or runs[-1]['sentence_transformers'] else 'no':>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# benchmarks/fake_llm_server.py
+"""
+Deterministic OpenAI-compatible chat completions server for offline
+benchmarks. It answers question-generation and grading prompts in the formats
+the parsers expect, after a configurable latency, and fails a configurable
+fraction of requests with 429/500 so the retry path is exercised too.
+
+    python -m benchmarks.fake_llm_server --port 8099 --latency-ms 300 --error-rate 0.05
+
+Point the app at it with OPENROUTER_BASE_URL=http://127.0.0.1:8099/v1.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+_STREAM_PIECE_CHARS = 24
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+def _topic(prompt: str, rng: random.Random) -> str:
+    words = [w for w in re.findall(r"[a-z]{6,}", prompt.lower()[-4000:])]
+    return rng.choice(words) if words else "the chapter"
+
+def _review_block(rng: random.Random) -> str:
+    accuracy, completeness, clarity = (rng.randint(30, 100) for _ in range(3))
+    final = round(accuracy * 0.5 + completeness * 0.3 + clarity * 0.2)
+    return (
+        f"ACCURACY: {accuracy}\nCOMPLETENESS: {completeness}\nCLARITY: {clarity}\n\n"
+        "FEEDBACK:\n- Covers the main idea\n- Misses some detail\n- Clear enough\n\n"
+        "STRENGTHS:\n- Identifies the key concept\n- Uses correct terms\n\n"
+        "WEAKNESSES:\n- Lacks supporting detail\n- Skips an example\n\n"
+        "SUGGESTED IMPROVEMENTS:\n- Add specific detail\n- Give an example\n\n"
+        f"FINAL SCORE: {final}"
+    )
+
+def fake_completion(prompt: str) -> str:
+    """Deterministic answer to one of the app's prompt templates"""
+    rng = random.Random(_digest(prompt))
+    tag = _digest(prompt)[:6]
+    count = re.search(r"Generate exactly (\d+)", prompt)
+    count = int(count.group(1)) if count else 1
+
+    if "multiple-choice" in prompt:
+        blocks = []
+        for i in range(count):
+            topic = _topic(prompt, rng)
+            blocks.append(
+                f"Q: Which statement about {topic} is correct? ({tag}-{i})\n"
+                f"A) {topic} is unrelated to the chapter\nB) {topic} behaves as the excerpt describes\n"
+                f"C) {topic} was disproved\nD) None of the above\n"
+                "Answer: B\nExplanation: The excerpt describes this directly."
+            )
+        return "\n\n".join(blocks)
+    if "short-answer" in prompt:
+        return "\n\n".join(
+            f"Q: Explain the role of {_topic(prompt, rng)} in this chapter. ({tag}-{i})\n"
+            f"Solution: It is described in the excerpt as central to the process."
+            for i in range(count)
+        )
+    if "### ANSWER" in prompt:
+        answers = len(re.findall(r"^Student Answer \d+:", prompt, re.MULTILINE)) or 1
+        return "\n\n".join(f"### ANSWER {n}\n{_review_block(rng)}" for n in range(1, answers + 1))
+    if "FINAL SCORE" in prompt:
+        return _review_block(rng)
+    return "OK"
+
+class FakeLLMServer:
+    """Threaded fake of the OpenAI /chat/completions endpoint (plain and streaming)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 200.0,
+                 jitter_ms: float = 50.0, error_rate: float = 0.0, seed: int = 0):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.seed = seed
+        self.stats = {"requests": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self._server.server_address[1]}/v1"
+
+    def start(self) -> str:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+                    return
+                status, payload = server.handle(body)
+                if status != 200:
+                    self._send_json(status, payload, {"Retry-After": "0"} if status == 429 else None)
+                elif body.get("stream"):
+                    self._send_stream(payload, (body.get("stream_options") or {}).get("include_usage", False))
+                else:
+                    self._send_json(200, payload)
+
+            def _send_json(self, status: int, payload: Dict, headers: Dict = None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, payload: Dict, include_usage: bool = False):
+                content = payload["choices"][0]["message"]["content"]
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                pieces = [content[i:i + _STREAM_PIECE_CHARS] for i in range(0, len(content), _STREAM_PIECE_CHARS)]
+                try:
+                    for piece in pieces:
+                        event = {
+                            "id": payload["id"], "object": "chat.completion.chunk",
+                            "created": payload["created"], "model": payload["model"],
+                            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+                        }
+                        self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    if include_usage:
+                        event = {
+                            "id": payload["id"], "object": "chat.completion.chunk",
+                            "created": payload["created"], "model": payload["model"],
+                            "choices": [], "usage": payload["usage"]
+                        }
+                        self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading, e.g. a stream cancelled once enough questions arrived
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def handle(self, body: Dict) -> Tuple[int, Dict]:
+        with self._lock:
+            self.stats["requests"] += 1
+            rng = random.Random(f"{self.seed}:{self.stats['requests']}")
+        time.sleep(max(0.0, rng.gauss(self.latency_ms, self.jitter_ms)) / 1000)
+
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self.stats["errors"] += 1
+            status = 429 if rng.random() < 0.5 else 500
+            return status, {"error": {"message": "injected failure", "code": status}}
+
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        content = fake_completion(prompt)
+        return 200, {
+            "id": f"chatcmpl-{_digest(prompt)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": len(prompt.split()),
+                "completion_tokens": len(content.split()),
+                "total_tokens": len(prompt.split()) + len(content.split())
+            }
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    print(f"Fake LLM serving on {server.start()} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/synthetic_pdfs.py
+"""
+Generate reproducible textbook PDFs laid out the way PDFProcessor expects
+("Chapter One" headings at the top of each chapter's first page).
+
+    python -m benchmarks.synthetic_pdfs ./bench_data --books 3 --chapters 5 --pages 8
+"""
+import argparse
+import os
+import random
+from pdf_extractors import PyMuPDFExtractor
+
+CHAPTER_WORDS = [
+    "One", "Two", "Three", "Four", "Five", "Six", "Seven", "Eight", "Nine", "Ten",
+    "Eleven", "Twelve", "Thirteen", "Fourteen", "Fifteen", "Sixteen", "Seventeen",
+    "Eighteen", "Nineteen", "Twenty"
+]
+
+_SUBJECTS = [
+    "photosynthesis", "mitochondria", "osmosis", "enzymes", "chromosomes", "velocity",
+    "acceleration", "momentum", "electrons", "isotopes", "catalysts", "equilibrium",
+    "ecosystems", "erosion", "magnetism", "refraction", "respiration", "digestion",
+    "circulation", "evaporation", "condensation", "friction", "gravity", "molecules"
+]
+_VERBS = ["controls", "depends on", "transfers energy to", "changes", "balances", "limits",
+          "produces", "absorbs", "regulates", "explains"]
+_ENDINGS = ["in living cells", "under constant pressure", "across a membrane", "in a closed system",
+            "at higher temperatures", "over long periods", "in most textbooks", "during the experiment"]
+
+LINES_PER_PAGE = 45
+_LINE_CHARS = 95
+
+def _sentence(rng: random.Random) -> str:
+    return f"{rng.choice(_SUBJECTS).capitalize()} {rng.choice(_VERBS)} {rng.choice(_SUBJECTS)} {rng.choice(_ENDINGS)}."
+
+def _page_lines(rng: random.Random, heading: str = None) -> list:
+    lines = [heading, ""] if heading else []
+    line = ""
+    while len(lines) < LINES_PER_PAGE:
+        sentence = _sentence(rng)
+        if len(line) + len(sentence) + 1 > _LINE_CHARS:
+            lines.append(line)
+            line = ""
+        line = f"{line} {sentence}".strip()
+    return lines
+
+def make_textbooks(folder: str, books: int = 3, chapters: int = 5, pages_per_chapter: int = 8,
+                   seed: int = 0) -> int:
+    """Write `books` PDFs into folder and return the total number of pages"""
+    if chapters > len(CHAPTER_WORDS):
+        raise ValueError(f"At most {len(CHAPTER_WORDS)} chapters per book are supported")
+    pymupdf = PyMuPDFExtractor._module()
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+
+    pages = 0
+    for b in range(books):
+        doc = pymupdf.open()
+        for word in CHAPTER_WORDS[:chapters]:
+            for p in range(pages_per_chapter):
+                page = doc.new_page()
+                lines = _page_lines(rng, f"Chapter {word}" if p == 0 else None)
+                page.insert_text((40, 40), "\n".join(lines), fontsize=8)
+                pages += 1
+        doc.save(os.path.join(folder, f"synthetic_book_{b + 1}.pdf"))
+        doc.close()
+    return pages
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic textbook PDFs")
+    parser.add_argument("folder")
+    parser.add_argument("--books", type=int, default=3)
+    parser.add_argument("--chapters", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=8, help="Pages per chapter")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pages = make_textbooks(args.folder, args.books, args.chapters, args.pages, args.seed)
+    print(f"Wrote {args.books} books ({pages} pages) to {args.folder}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# chapter_catalog.py
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+from config import Config
+from fingerprint import chunk_hash, object_hash
+
+class ChapterCatalog:
+    """
+    books -> chapters -> {chunk_count, word_count, hash}, written by ingest
+    once a book's upserts have completed. The whole catalog is held in memory
+    and reloaded only when another process rewrites the file.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or Config.CATALOG_PATH
+        self._lock = threading.Lock()
+        self._books: Dict[str, Dict] = {}
+        self._mtime = None
+        self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self._books = json.load(f)
+        self._mtime = mtime
+
+    def _write(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._books, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    @staticmethod
+    def summarize(chapters: Dict[str, List[str]]) -> Dict[str, Dict]:
+        """Per-chapter catalog entries for a book's chunked chapters"""
+        return {
+            chapter_name: {
+                "chunk_count": len(chunks),
+                "word_count": sum(len(chunk.split()) for chunk in chunks),
+                "hash": object_hash([chunk_hash(chunk) for chunk in chunks])
+            }
+            for chapter_name, chunks in chapters.items()
+        }
+
+    def update_book(self, book_title: str, chapters: Dict[str, List[str]]):
+        """Record a book's chapters in reading order"""
+        self.set_book(book_title, self.summarize(chapters))
+
+    def set_book(self, book_title: str, summary: Dict[str, Dict]):
+        with self._lock:
+            self._reload_if_changed()
+            self._books[book_title] = {"updated_at": time.time(), "chapters": summary}
+            self._write()
+
+    def remove_book(self, book_title: str):
+        with self._lock:
+            self._reload_if_changed()
+            if self._books.pop(book_title, None) is not None:
+                self._write()
+
+    def has_book(self, book_title: str) -> bool:
+        with self._lock:
+            self._reload_if_changed()
+            return book_title in self._books
+
+    def books(self) -> List[str]:
+        with self._lock:
+            self._reload_if_changed()
+            return sorted(self._books)
+
+    def chapters(self, book_title: str) -> List[str]:
+        """Chapter names of a book in reading order (empty if the book is unknown)"""
+        with self._lock:
+            self._reload_if_changed()
+            return list(self._books.get(book_title, {}).get("chapters", {}))
+
+    def chapter_info(self, book_title: str, chapter_name: str) -> Optional[Dict]:
+        with self._lock:
+            self._reload_if_changed()
+            return self._books.get(book_title, {}).get("chapters", {}).get(chapter_name)
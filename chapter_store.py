@@ -0,0 +1,82 @@
+# chapter_store.py
+import sqlite3
+import threading
+from typing import Dict, List
+from config import Config
+from fingerprint import chunk_hash
+
+class ChapterStore:
+    """
+    Local copy of every ingested chapter as ordered chunks, so full chapters
+    can be read back without pulling them out of the vector index
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or Config.CHAPTER_STORE_PATH
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                book TEXT NOT NULL,
+                chapter TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (book, chapter, chunk_index)
+            )
+        """)
+        self.conn.commit()
+
+    def save_chapter(self, book_title: str, chapter_name: str, chunks: List[str]):
+        """Replace the stored chunks of a chapter"""
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM chunks WHERE book = ? AND chapter = ?",
+                (book_title, chapter_name)
+            )
+            self.conn.executemany(
+                "INSERT INTO chunks (book, chapter, chunk_index, chunk_hash, text) VALUES (?, ?, ?, ?, ?)",
+                [(book_title, chapter_name, i, chunk_hash(chunk), chunk) for i, chunk in enumerate(chunks)]
+            )
+            self.conn.commit()
+
+    def save_book(self, book_title: str, chapters: Dict[str, List[str]]):
+        """Replace every stored chapter of a book"""
+        with self._lock:
+            self.conn.execute("DELETE FROM chunks WHERE book = ?", (book_title,))
+            self.conn.executemany(
+                "INSERT INTO chunks (book, chapter, chunk_index, chunk_hash, text) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (book_title, chapter_name, i, chunk_hash(chunk), chunk)
+                    for chapter_name, chunks in chapters.items()
+                    for i, chunk in enumerate(chunks)
+                ]
+            )
+            self.conn.commit()
+
+    def has_book(self, book_title: str) -> bool:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM chunks WHERE book = ? LIMIT 1",
+                (book_title,)
+            ).fetchone()
+        return row is not None
+
+    def get_chunks(self, book_title: str, chapter_name: str) -> List[str]:
+        """Return a chapter's chunks in reading order (empty if it isn't stored)"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT text FROM chunks WHERE book = ? AND chapter = ? ORDER BY chunk_index",
+                (book_title, chapter_name)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_chunk_hashes(self, book_title: str, chapter_name: str) -> List[str]:
+        """Fingerprints of a chapter's current chunks in reading order"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT chunk_hash FROM chunks WHERE book = ? AND chapter = ? ORDER BY chunk_index",
+                (book_title, chapter_name)
+            ).fetchall()
+        return [row[0] for row in rows]
@@ -0,0 +1,122 @@
+# chunk_manifest.py
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from config import Config
+from fingerprint import chunk_hash, object_hash
+
+class ChunkManifest:
+    """
+    Local record of every chunk that has been upserted to the vector index,
+    keyed by (book, chapter, chunk_hash), plus a fingerprint per book so
+    unchanged books can be skipped without touching the index at all
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or Config.MANIFEST_PATH
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                book TEXT NOT NULL,
+                chapter TEXT NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                PRIMARY KEY (book, chapter, chunk_hash)
+            );
+            CREATE TABLE IF NOT EXISTS books (
+                book TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def existing_hashes(self, book_title: str) -> Set[Tuple[str, str]]:
+        """Return every (chapter, chunk_hash) recorded for a book in one pass"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT chapter, chunk_hash FROM chunks WHERE book = ?",
+                (book_title,)
+            ).fetchall()
+        return set(rows)
+
+    def chunk_ids(self, book_title: str) -> List[str]:
+        """Return the vector ids recorded for a book"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT chunk_id FROM chunks WHERE book = ?",
+                (book_title,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def chunk_entries(self, book_title: str) -> List[Tuple[str, str, str]]:
+        """Return every recorded (chapter, chunk_hash, chunk_id) for a book"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT chapter, chunk_hash, chunk_id FROM chunks WHERE book = ?",
+                (book_title,)
+            ).fetchall()
+
+    def record_chunks(self, book_title: str, chunks: Iterable[Tuple[str, str, str, int]]):
+        """Record (chapter, chunk_hash, chunk_id, chunk_index) rows as present in the index"""
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO chunks (book, chapter, chunk_hash, chunk_id, chunk_index) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(book_title, *chunk) for chunk in chunks]
+            )
+            self.conn.commit()
+
+    def forget_chunk_ids(self, book_title: str, chunk_ids: Iterable[str]):
+        """Drop rows whose vectors are no longer in the index"""
+        with self._lock:
+            self.conn.executemany(
+                "DELETE FROM chunks WHERE book = ? AND chunk_id = ?",
+                [(book_title, chunk_id) for chunk_id in chunk_ids]
+            )
+            self.conn.execute("DELETE FROM books WHERE book = ?", (book_title,))
+            self.conn.commit()
+
+    @staticmethod
+    def chunk_keys(chapters: Dict[str, List[str]]) -> Set[Tuple[str, str]]:
+        """The (chapter, chunk_hash) keys making up a book's current content"""
+        return {
+            (chapter_name, chunk_hash(chunk))
+            for chapter_name, chunks in chapters.items()
+            for chunk in chunks
+        }
+
+    @staticmethod
+    def fingerprint_chapters(chapters: Dict[str, List[str]]) -> str:
+        """Fingerprint a book's chunked chapters so unchanged books can be detected"""
+        return object_hash({
+            chapter_name: [chunk_hash(chunk) for chunk in chunks]
+            for chapter_name, chunks in chapters.items()
+        })
+
+    def book_fingerprint(self, book_title: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT fingerprint FROM books WHERE book = ?",
+                (book_title,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def is_book_unchanged(self, book_title: str, fingerprint: str) -> bool:
+        """True when the book was fully ingested before with identical content"""
+        return self.book_fingerprint(book_title) == fingerprint
+
+    def mark_book(self, book_title: str, fingerprint: str, chunk_count: int):
+        """Record that every chunk of the book has been upserted"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO books (book, fingerprint, chunk_count, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (book_title, fingerprint, chunk_count, time.time())
+            )
+            self.conn.commit()
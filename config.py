@@ -9,26 +9,102 @@ class Config:
     PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
     PINECONE_INDEX_NAME = "learnbuddy"
     EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_DIMENSION = 384
+    EMBEDDING_BATCH_SIZE = 64
+    EMBEDDING_SORT_BY_LENGTH = True
+    UPSERT_BATCH_SIZE = 100
+    FETCH_BATCH_SIZE = 100
+    INDEX_READY_TIMEOUT = 300
+    INDEX_READY_POLL_INITIAL = 0.5
+    INDEX_READY_POLL_MAX = 8
+    
+    # Vector Index ("pinecone" or "local")
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+    LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "./.vector_index")
+    LOCAL_INDEX_SEARCH = os.getenv("LOCAL_INDEX_SEARCH", "exact")
+    LOCAL_INDEX_EXACT_MAX = 20_000
+    LOCAL_INDEX_OVERSAMPLE = 4
+    LOCAL_INDEX_IVF_LISTS = 256
+    LOCAL_INDEX_IVF_PROBES = 16
+    LOCAL_INDEX_HNSW_M = 32
+    LOCAL_INDEX_INITIAL_CAPACITY = 1024
+    
+    # PDF Extraction
+    PDF_EXTRACTOR = os.getenv("PDF_EXTRACTOR", "pymupdf")
+    PDF_EXTRACT_WORKERS = os.cpu_count() or 1
+    PDF_PARALLEL_MIN_PAGES = 50
+    PDF_CHUNK_MIN_TOKENS = 130  # word-based estimate, see token_counter.estimate_token_counts
+    PDF_CHUNK_MAX_TOKENS = 650
+    
+    # Ingest Pipeline
+    INGEST_PARSE_WORKERS = os.cpu_count() or 1
+    INGEST_QUEUE_SIZE = 32
+    INGEST_UPSERT_WORKERS = 4
     
     # OpenRouter Configuration
     OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+    OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
     LLM_MODEL = "deepseek/deepseek-r1-distill-llama-70b:free"
     SITE_URL = os.getenv("SITE_URL", "http://localhost")
     SITE_NAME = os.getenv("SITE_NAME", "LearnBuddy")
+    LLM_MAX_OUTPUT_TOKENS = 4000  # room for LLM_REASONING_TOKENS plus the answer itself
+    TOKENIZER_MODEL = "deepseek-ai/DeepSeek-R1-Distill-Llama-70B"
+    TOKEN_COUNT_CACHE_SIZE = 100_000
+    LLM_MAX_CONCURRENCY = 32
+    LLM_MAX_CONNECTIONS = 64
+    LLM_TIMEOUT = 120
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "20"))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))  # 0 = unlimited
+    LLM_MAX_RETRIES = 5
+    LLM_RETRY_BASE_DELAY = 1.0
+    LLM_RETRY_MAX_DELAY = 60
     
     # Content Handling Parameters
     MAX_CHUNK_TOKENS = 3000 
     MAX_CHUNKS = 10
     SINGLE_BATCH_THRESHOLD = 2000 
     QUESTIONS_PER_CHUNK = 3
+    OUTPUT_TOKENS_PER_QUESTION = {"mcq": 200, "written": 300}
+    # The R1 distill model thinks before it answers; its reasoning alone often runs to 1-2k tokens
+    LLM_REASONING_TOKENS = 1600
     MAX_WORKERS = 4 
     CACHE_DIR = "./.chapter_cache"
+    MANIFEST_PATH = "./.ingest_manifest.db"
+    CHAPTER_STORE_PATH = "./.chapter_store.db"
+    CATALOG_PATH = "./.chapter_catalog.json"
+    CHAPTER_CACHE_TTL = 600
+    CHAPTER_CACHE_MAX_ENTRIES = 128
+    CHAPTER_CACHE_MAX_CHARS = 50_000_000
+    CHAPTER_LIST_CACHE_MAX_ENTRIES = 256
+    FINGERPRINT_VERSION = "1"
     MAX_CONTEXT_WINDOW = 8000  
     SAFETY_MARGIN = 0.9 
     
+    # Focused Retrieval
+    FOCUSED_RETRIEVAL = True
+    RETRIEVAL_TOP_K = 6
+    RETRIEVAL_CANDIDATES_PER_QUERY = 20
+    RETRIEVAL_STRENGTH_PENALTY = 0.5
+    
+    # Question Deduplication
+    SEMANTIC_DEDUP = True
+    DEDUP_SIMILARITY_THRESHOLD = 0.9  # cosine similarity of question embeddings
+    DEDUP_SURPLUS_RATIO = 0.25  # extra questions requested to backfill dropped duplicates (0 = exact counts, no early stop)
+    
+    # Question Bank
+    QUESTION_BANK_ENABLED = True
+    QUESTION_BANK_PATH = "./.question_bank.db"
+    QUESTION_BANK_MIN_RELEVANCE = 0.35  # for banked questions not tagged with the requested weaknesses
+    WARMUP_POOL_SIZE = {"mcq": 5, "written": 3}  # questions pre-generated per chunk and type
+    WARMUP_MAX_CALLS = 200
+    
     # Review System Parameters
     MAX_REVIEW_LENGTH = 10000 
     REVIEW_CACHE_DIR = "./.review_cache"
+    REVIEW_MAX_WORKERS = 8
+    BATCH_REVIEW_WINDOW = 50
+    BATCH_REVIEW_MAX_ANSWERS_PER_PROMPT = 8
+    BATCH_REVIEW_OUTPUT_TOKENS_PER_ANSWER = 500
     REVIEW_WEIGHTS = {
         "content": 0.4,
         "structure": 0.3,
@@ -36,6 +112,11 @@ class Config:
         "readability": 0.1
     }
     
+    # Telemetry
+    TELEMETRY_PORT = int(os.getenv("TELEMETRY_PORT", "0"))  # 0 = no metrics endpoint
+    TELEMETRY_JSONL_PATH = os.getenv("TELEMETRY_JSONL_PATH")
+    TELEMETRY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+    
     # Paths
     DATA_FOLDER = "./data"
     OUTPUT_FOLDER = "./output"
@@ -200,6 +281,39 @@ SUGGESTED IMPROVEMENTS:
 - [Suggestion 2]
 - [Suggestion 3]
 
+FINAL SCORE: [weighted average score 0-100]"""
+
+    EXAM_BATCH_REVIEW_TEMPLATE = """Evaluate each student's answer against the expected solution for this question. Grade every answer independently of the others.
+
+Question: {question}
+
+Expected Solution: {sample_solution}
+
+{answers}
+
+For EACH answer, start with a line "### ANSWER [number]" and then provide detailed feedback in this EXACT format:
+
+ACCURACY: [0-100] (how correct is the answer)
+COMPLETENESS: [0-100] (how thoroughly it addresses the question)
+CLARITY: [0-100] (how clear and well-structured the response is)
+
+FEEDBACK:
+- [Specific feedback on content accuracy]
+- [Specific feedback on missing elements]
+- [Specific feedback on structure/clarity]
+
+STRENGTHS:
+- [Strength 1]
+- [Strength 2]
+
+WEAKNESSES:
+- [Weakness 1]
+- [Weakness 2]
+
+SUGGESTED IMPROVEMENTS:
+- [Suggestion 1]
+- [Suggestion 2]
+
 FINAL SCORE: [weighted average score 0-100]"""
 
     MCQ_WEAKNESS_TEMPLATE = """Generate exactly {num_questions} multiple-choice questions targeting these student weaknesses: {weaknesses}.
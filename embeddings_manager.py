@@ -1,32 +1,97 @@
 # embeddings_manager.py
-import pinecone
-from sentence_transformers import SentenceTransformer
-from typing import Dict, List
+import numpy as np
+from typing import Dict, List, Set, Tuple
 from config import Config
+from chunk_manifest import ChunkManifest
+from chapter_catalog import ChapterCatalog
+from fingerprint import chunk_hash as fingerprint_chunk
+from ttl_cache import chapter_list_cache
+from vector_store import LocalVectorIndex
+import threading
 import time
 
 class EmbeddingsManager:
+    _shared = None
+    _shared_lock = threading.Lock()
+
     def __init__(self):
-        self.model = SentenceTransformer(Config.EMBEDDING_MODEL)
-        self.pinecone = pinecone.Pinecone(api_key=Config.PINECONE_API_KEY)
-        self.index = self._initialize_index()
+        # The model (and torch) and the index connection are loaded on first use,
+        # so paths served from the chapter store and catalog never pay for them
+        self._model = None
+        self._index = None
+        self._load_lock = threading.Lock()
+        self.pinecone = None
+        self.manifest = ChunkManifest()
+        self.catalog = ChapterCatalog()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(Config.EMBEDDING_MODEL)
+        return self._model
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._load_lock:
+                if self._index is None:
+                    self._index = self._initialize_index()
+        return self._index
+
+    @classmethod
+    def shared(cls) -> "EmbeddingsManager":
+        """Process-wide instance, so the model and index handle are set up once"""
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
 
     def _initialize_index(self):
+        """Open the configured vector index backend"""
+        if Config.VECTOR_BACKEND == "local":
+            return LocalVectorIndex()
+        if Config.VECTOR_BACKEND != "pinecone":
+            raise ValueError(f"Unknown vector backend '{Config.VECTOR_BACKEND}', expected 'pinecone' or 'local'")
+        return self._initialize_pinecone_index()
+
+    def _initialize_pinecone_index(self):
         """Initialize or connect to Pinecone index"""
+        import pinecone
+        self.pinecone = pinecone.Pinecone(api_key=Config.PINECONE_API_KEY)
         if Config.PINECONE_INDEX_NAME not in self.pinecone.list_indexes().names():
             self.pinecone.create_index(
                 name=Config.PINECONE_INDEX_NAME,
-                dimension=384, 
+                dimension=Config.EMBEDDING_DIMENSION, 
                 metric='cosine'
             )
-            time.sleep(60)
+            self._wait_until_ready()
             
         return self.pinecone.Index(Config.PINECONE_INDEX_NAME)
 
+    def _wait_until_ready(self):
+        """Poll the new index's status with exponential backoff until it can serve requests"""
+        delay = Config.INDEX_READY_POLL_INITIAL
+        deadline = time.monotonic() + Config.INDEX_READY_TIMEOUT
+        while True:
+            status = self.pinecone.describe_index(Config.PINECONE_INDEX_NAME).status
+            ready = status.get('ready') if isinstance(status, dict) else getattr(status, 'ready', False)
+            if ready:
+                return
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(
+                    f"Index '{Config.PINECONE_INDEX_NAME}' not ready after {Config.INDEX_READY_TIMEOUT} seconds"
+                )
+            time.sleep(delay)
+            delay = min(delay * 2, Config.INDEX_READY_POLL_MAX)
+
     def check_chunk_exists(self, book_title: str, chapter_name: str, chunk_hash: str) -> bool:
         """Check if a chunk already exists in the index using a content hash"""
         results = self.index.query(
-            vector=[0]*384,  
+            vector=[0]*Config.EMBEDDING_DIMENSION,  
             top_k=1,
             filter={
                 "book": {"$eq": book_title},
@@ -37,52 +102,157 @@ class EmbeddingsManager:
         )
         return len(results['matches']) > 0
 
-    def create_embeddings(self, chapters: Dict[str, List[str]], book_title: str):
+    def fetch_existing_ids(self, chunk_ids: List[str]) -> Set[str]:
+        """Return the subset of ids present in the index using batched fetches"""
+        found = set()
+        batch_size = Config.FETCH_BATCH_SIZE
+        for start in range(0, len(chunk_ids), batch_size):
+            response = self.index.fetch(ids=chunk_ids[start:start + batch_size])
+            found.update(response.vectors.keys())
+        return found
+
+    def reconcile_manifest(self, book_title: str) -> int:
+        """Drop manifest entries for vectors that have disappeared from the index"""
+        recorded = self.manifest.chunk_ids(book_title)
+        missing = set(recorded) - self.fetch_existing_ids(recorded)
+        if missing:
+            self.manifest.forget_chunk_ids(book_title, missing)
+        return len(missing)
+
+    def prune_stale_chunks(self, book_title: str, current_keys: Set[Tuple[str, str]]) -> int:
         """
-        Create embeddings for chunks, checking for duplicates
+        Delete vectors recorded for a book whose (chapter, chunk_hash) is no longer
+        part of its content, e.g. after the PDF or the chunking changed
         """
-        vectors = []
+        stale = [
+            chunk_id for chapter_name, chunk_hash, chunk_id in self.manifest.chunk_entries(book_title)
+            if (chapter_name, chunk_hash) not in current_keys
+        ]
+        batch_size = Config.FETCH_BATCH_SIZE
+        for start in range(0, len(stale), batch_size):
+            self.index.delete(ids=stale[start:start + batch_size])
+        if stale:
+            self.manifest.forget_chunk_ids(book_title, stale)
+        return len(stale)
+
+    def encode_chunks(self, chunks: List[str]) -> np.ndarray:
+        """
+        Encode chunks in batches and return a contiguous float32 matrix whose
+        rows line up with the input order
+        """
+        embeddings = np.empty((len(chunks), Config.EMBEDDING_DIMENSION), dtype=np.float32)
+        if not chunks:
+            return embeddings
+
+        # Bucketing chunks of similar length together keeps padding per batch small
+        if Config.EMBEDDING_SORT_BY_LENGTH:
+            order = np.argsort([len(chunk) for chunk in chunks], kind='stable')
+        else:
+            order = np.arange(len(chunks))
+
+        batch_size = Config.EMBEDDING_BATCH_SIZE
+        for start in range(0, len(chunks), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self.model.encode(
+                [chunks[row] for row in rows],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+
+        return embeddings
+
+    def find_new_chunks(self, chapters: Dict[str, List[str]], book_title: str,
+                        known: Set[Tuple[str, str]] = None) -> Tuple[List[Tuple], int]:
+        """
+        Split a book's chunks into ones still missing from the index and a count of
+        those already present. Pending entries are (chapter, index, text, hash, id).
+        known is the book's manifest hashes, if the caller already loaded them.
+        """
+        if known is None:
+            known = self.manifest.existing_hashes(book_title)
+        candidates = []
         existing_count = 0
-        new_count = 0
         
         for chapter_name, chunks in chapters.items():
             for i, chunk in enumerate(chunks):
-                chunk_hash = str(hash(chunk))  
+                chunk_hash = fingerprint_chunk(chunk)
                 
-                if self.check_chunk_exists(book_title, chapter_name, chunk_hash):
+                if (chapter_name, chunk_hash) in known:
                     existing_count += 1
                     continue
                     
-                embedding = self.model.encode(chunk)
                 chunk_id = f"{book_title}-{chapter_name}-{i}-{chunk_hash[:8]}"
-                
-                vectors.append({
-                    "id": chunk_id,
-                    "values": embedding.tolist(),
-                    "metadata": {
-                        "book": book_title,
-                        "chapter": chapter_name,
-                        "text": chunk,
-                        "chunk_hash": chunk_hash,
-                        "chunk_index": i
-                    }
-                })
-                new_count += 1
-                
-                if len(vectors) >= 100:
-                    self.index.upsert(vectors=vectors)
-                    vectors = []
+                candidates.append((chapter_name, i, chunk, chunk_hash, chunk_id))
+        
+        # Chunks missing from the manifest may still be in the index (e.g. a fresh
+        # manifest), so confirm them with a few bulk fetches rather than one query each
+        remote = self.fetch_existing_ids([c[4] for c in candidates])
+        if remote:
+            self.manifest.record_chunks(book_title, [
+                (chapter_name, chunk_hash, chunk_id, i)
+                for chapter_name, i, _, chunk_hash, chunk_id in candidates
+                if chunk_id in remote
+            ])
+            existing_count += len(remote)
         
-        if vectors:
-            self.index.upsert(vectors=vectors)
+        return [c for c in candidates if c[4] not in remote], existing_count
+
+    def upsert_chunks(self, book_title: str, pending: List[Tuple], embeddings: np.ndarray):
+        """Upsert pending chunks with their embedding rows and record them in the manifest"""
+        values = embeddings.tolist()
+        vectors = []
+        for (chapter_name, i, chunk, chunk_hash, chunk_id), embedding in zip(pending, values):
+            vectors.append({
+                "id": chunk_id,
+                "values": embedding,
+                "metadata": {
+                    "book": book_title,
+                    "chapter": chapter_name,
+                    "text": chunk,
+                    "chunk_hash": chunk_hash,
+                    "chunk_index": i
+                }
+            })
+        self.index.upsert(vectors=vectors)
+        self.manifest.record_chunks(book_title, [
+            (chapter_name, chunk_hash, chunk_id, i)
+            for chapter_name, i, _, chunk_hash, chunk_id in pending
+        ])
+
+    def create_embeddings(self, chapters: Dict[str, List[str]], book_title: str):
+        """
+        Create embeddings for chunks, checking for duplicates
+        """
+        pending, existing_count = self.find_new_chunks(chapters, book_title)
+        embeddings = self.encode_chunks([c[2] for c in pending])
+        
+        batch_size = Config.UPSERT_BATCH_SIZE
+        for start in range(0, len(pending), batch_size):
+            self.upsert_chunks(
+                book_title,
+                pending[start:start + batch_size],
+                embeddings[start:start + batch_size]
+            )
             
-        print(f"Processed {existing_count} existing chunks, added {new_count} new chunks")
+        print(f"Processed {existing_count} existing chunks, added {len(pending)} new chunks")
 
     def list_available_chapters(self, book_title: str = None) -> List[str]:
         """List all chapters available in Pinecone"""
+        return chapter_list_cache.get_or_load(
+            (book_title, 'index'),
+            lambda: self._list_chapters(book_title)
+        )
+
+    def _list_chapters(self, book_title: str = None) -> List[str]:
+        books = [book_title] if book_title else self.catalog.books()
+        if books and all(self.catalog.has_book(book) for book in books):
+            return sorted({chapter for book in books for chapter in self.catalog.chapters(book)})
+        
+        # Books ingested before the catalog existed can only be found by scanning the index
         chapters = set()
         results = self.index.query(
-            vector=[0]*384,
+            vector=[0]*Config.EMBEDDING_DIMENSION,
             top_k=10000,
             filter={"book": {"$eq": book_title}} if book_title else {},
             include_metadata=True
@@ -0,0 +1,34 @@
+# fingerprint.py
+import hashlib
+import json
+import re
+import unicodedata
+from typing import Any
+from config import Config
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_text(text: str) -> str:
+    """Normalize unicode and collapse whitespace so formatting noise doesn't change hashes"""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+def stable_hash(text: str, *salts: Any) -> str:
+    """
+    Deterministic BLAKE2 fingerprint of normalized text, salted with the
+    fingerprint version and any extra context (model name, template, params).
+    Unlike the builtin hash() this is identical across processes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(Config.FINGERPRINT_VERSION.encode('utf-8'))
+    for salt in salts:
+        digest.update(b'\0' + str(salt).encode('utf-8'))
+    digest.update(b'\0\0' + normalize_text(text).encode('utf-8'))
+    return digest.hexdigest()
+
+def chunk_hash(chunk: str) -> str:
+    """Fingerprint of an ingested chunk, tied to the embedding model that encodes it"""
+    return stable_hash(chunk, Config.EMBEDDING_MODEL)
+
+def object_hash(obj: Any, *salts: Any) -> str:
+    """Fingerprint of a JSON-serializable object such as an exam paper"""
+    return stable_hash(json.dumps(obj, sort_keys=True, ensure_ascii=False), *salts)
\ No newline at end of file
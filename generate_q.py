@@ -1,6 +1,8 @@
 from retrieve_book import ChapterRetriever
 from question_generator import QuestionGenerator
+from question_bank import QuestionBank, source_chunk_hashes
 from config import Config
+from telemetry import telemetry, start_exporter
 import json
 import os
 import logging
@@ -13,10 +15,14 @@ class QuestionGeneratorApp:
     def __init__(self):
         self.retriever = ChapterRetriever()
         self.generator = QuestionGenerator()
+        self.bank = QuestionBank() if Config.QUESTION_BANK_ENABLED else None
+        start_exporter()
     
     def generate_questions(self, book_title: str, chapter_num: str, question_type: str, 
                          num_questions: int = Config.DEFAULT_NUM_QUESTIONS,
-                         weaknesses: list = None, strengths: list = None) -> dict:
+                         weaknesses: list = None, strengths: list = None,
+                         focused_retrieval: bool = Config.FOCUSED_RETRIEVAL,
+                         learner_id: str = None) -> dict:
         """
         Generate questions based on the given parameters
         
@@ -27,41 +33,88 @@ class QuestionGeneratorApp:
             num_questions: Number of questions to generate
             weaknesses: List of student weaknesses to target
             strengths: List of student strengths to avoid
+            focused_retrieval: With weaknesses given, generate from the chapter chunks
+                most relevant to them instead of the whole chapter
+            learner_id: Who the questions are for; questions from the question bank
+                are never repeated for the same learner (None = shared history)
             
         Returns:
             Dictionary containing:
             - questions: List of generated questions
             - output_path: Path where questions were saved
             - time_taken: Time taken in seconds
+            - from_bank: How many questions came from the question bank
         """
         result = {
             'questions': [],
             'output_path': None,
             'time_taken': 0,
+            'from_bank': 0,
             'success': False,
             'error': None
         }
         
         try:
             start_time = time()
+            chapter_name = self.retriever.chapter_name(chapter_num)
+            learner = learner_id or ""
             
-            logger.info(f"Retrieving content for {book_title}, Chapter {chapter_num}...")
-            chapter_content = self.retriever.get_full_chapter(book_title, chapter_num)
+            # Embedded once, for both the bank's relevance check and focused retrieval
+            focus_vectors = None
+            if weaknesses and (self.bank or focused_retrieval):
+                focus_vectors = self.retriever.encode_focus(weaknesses, strengths)
             
-            if not chapter_content:
-                raise ValueError("No content found for this chapter")
-                
-            content_size = len(chapter_content.split())
-            logger.info(f"Processing {content_size} words of chapter content...")
+            banked = []
+            if self.bank:
+                with telemetry.span("app.bank_lookup", question_type=question_type):
+                    banked = self._from_bank(book_title, chapter_name, question_type, num_questions,
+                                             learner, weaknesses, focus_vectors)
+                telemetry.record_cache("question_bank", hit=len(banked) >= num_questions)
+            questions = [question for _, question in banked]
+            served_ids = [question_id for question_id, _ in banked]
+            shortfall = num_questions - len(banked)
             
-            logger.info(f"Generating {num_questions} {question_type} questions...")
-            questions = self.generator.generate_questions(
-                context=chapter_content,
-                question_type=question_type,
-                num_questions=num_questions,
-                weaknesses=weaknesses,
-                strengths=strengths
-            )
+            if shortfall > 0:
+                logger.info(f"Retrieving content for {book_title}, Chapter {chapter_num}...")
+                with telemetry.span("app.retrieval", focused=bool(weaknesses and focused_retrieval)):
+                    chapter_content = None
+                    source_chunks = None
+                    if weaknesses and focused_retrieval:
+                        chunks = self.retriever.get_relevant_chunks(book_title, chapter_num, weaknesses, strengths,
+                                                                    query_vectors=focus_vectors)
+                        if chunks:
+                            logger.info(f"Using the {len(chunks)} chunks most relevant to the weaknesses")
+                            chapter_content = "\n\n".join(chunks)
+                            source_chunks = chunks
+                    if not chapter_content:
+                        chapter_content = self.retriever.get_full_chapter(book_title, chapter_num)
+                
+                if not chapter_content:
+                    raise ValueError("No content found for this chapter")
+                    
+                content_size = len(chapter_content.split())
+                logger.info(f"Processing {content_size} words of chapter content...")
+                
+                # Cached chunk results may be exactly what this learner was served before
+                served = self._served_questions(book_title, chapter_name, question_type, learner) if self.bank else []
+                logger.info(f"Generating {shortfall} {question_type} questions ({len(banked)} from the question bank)...")
+                with telemetry.span("app.generation", question_type=question_type):
+                    generated = self.generator.generate_questions(
+                        context=chapter_content,
+                        question_type=question_type,
+                        num_questions=shortfall,
+                        weaknesses=weaknesses,
+                        strengths=strengths,
+                        exclude=questions + served,
+                        use_cache=not served
+                    )
+                
+                if self.bank:
+                    generated_ids = self._bank_questions(
+                        book_title, chapter_name, question_type, generated, weaknesses, source_chunks
+                    )
+                    served_ids += generated_ids
+                questions += generated
             
             # Create output filename
             output_file = f"{book_title}_chapter_{chapter_num}_{question_type}"
@@ -70,9 +123,13 @@ class QuestionGeneratorApp:
             output_file += ".json"
             output_path = os.path.join(Config.OUTPUT_FOLDER, output_file)
             
-            os.makedirs(Config.OUTPUT_FOLDER, exist_ok=True)
-            with open(output_path, 'w') as f:
-                json.dump(questions, f, indent=2)
+            with telemetry.span("app.save"):
+                os.makedirs(Config.OUTPUT_FOLDER, exist_ok=True)
+                with open(output_path, 'w') as f:
+                    json.dump(questions, f, indent=2)
+            
+            if self.bank:
+                self.bank.mark_served(learner, served_ids)
             
             elapsed = time() - start_time
             logger.info(f"Successfully generated {len(questions)} questions in {elapsed:.2f} seconds")
@@ -81,6 +138,7 @@ class QuestionGeneratorApp:
                 'questions': questions,
                 'output_path': output_path,
                 'time_taken': elapsed,
+                'from_bank': len(banked),
                 'success': True
             })
             
@@ -90,6 +148,51 @@ class QuestionGeneratorApp:
             
         return result
     
+    def _from_bank(self, book_title: str, chapter_name: str, question_type: str, num_questions: int,
+                   learner: str, weaknesses: list = None, focus_vectors=None) -> list:
+        """Fresh, unseen (id, question) pairs from the question bank; never fails the request"""
+        try:
+            current_hashes = self.retriever.chapter_store.get_chunk_hashes(book_title, chapter_name)
+            if not current_hashes:
+                return []
+            weakness_vectors = strength_vectors = None
+            if weaknesses and focus_vectors is not None:
+                weakness_vectors, strength_vectors = focus_vectors[:len(weaknesses)], focus_vectors[len(weaknesses):]
+            return self.bank.find_fresh(
+                book_title, chapter_name, question_type, num_questions, current_hashes, learner,
+                weaknesses, weakness_vectors, strength_vectors
+            )
+        except Exception as e:
+            logger.warning(f"Question bank lookup failed: {str(e)}")
+            return []
+
+    def _served_questions(self, book_title: str, chapter_name: str, question_type: str, learner: str) -> list:
+        """Questions of the chapter the learner has already seen; never fails the request"""
+        try:
+            return self.bank.served_questions(book_title, chapter_name, question_type, learner)
+        except Exception as e:
+            logger.warning(f"Question bank history lookup failed: {str(e)}")
+            return []
+
+    def _bank_questions(self, book_title: str, chapter_name: str, question_type: str,
+                        generated: list, weaknesses: list = None, source_chunks: list = None) -> list:
+        """Record newly generated questions in the question bank and return their ids"""
+        try:
+            chunks = source_chunks or self.retriever.chapter_store.get_chunks(book_title, chapter_name)
+            try:
+                embeddings = self.generator.embed_questions([q['question'] for q in generated]) if generated else None
+            except Exception as e:
+                logger.warning(f"Could not embed questions for the question bank: {str(e)}")
+                embeddings = None
+            ids = self.bank.add_questions(
+                book_title, chapter_name, question_type, generated,
+                source_chunk_hashes(generated, chunks), weaknesses, embeddings
+            )
+        except Exception as e:
+            logger.warning(f"Could not store questions in the question bank: {str(e)}")
+            ids = []
+        return ids
+
     def print_sample_questions(self, questions: list, num_samples: int = 3):
         """Print sample questions from the generated list"""
         print("\nSample questions:")
@@ -105,42 +208,41 @@ class QuestionGeneratorApp:
 
 
 # Example usage
-app = QuestionGeneratorApp()
+if __name__ == "__main__":
+    app = QuestionGeneratorApp()
 
-# # Example 1: Basic MCQ generation
-# basic_result = app.generate_questions(
-#     book_title="chemistry9_10",
-#     chapter_num="Eight",
-#     question_type="mcq",
-#     num_questions=5
-# )
+    # # Example 1: Basic MCQ generation
+    # basic_result = app.generate_questions(
+    #     book_title="chemistry9_10",
+    #     chapter_num="Eight",
+    #     question_type="mcq",
+    #     num_questions=5
+    # )
 
-# if basic_result['success']:
-#     app.print_sample_questions(basic_result['questions'])
-#     print(f"\nQuestions saved to: {basic_result['output_path']}")
-# else:
-#     print(f"Error: {basic_result['error']}")
+    # if basic_result['success']:
+    #     app.print_sample_questions(basic_result['questions'])
+    #     print(f"\nQuestions saved to: {basic_result['output_path']}")
+    # else:
+    #     print(f"Error: {basic_result['error']}")
 
-# Example 2: Personalized written questions
-personalized_result = app.generate_questions(
-    book_title="chemistry9_10",
-    chapter_num="Eight",
-    question_type="written",
-    num_questions=3,
-    weaknesses=[
-        "Lacks specific details about the number of divisions and cells produced",
-        "Missing specific terminology which is crucial for a complete understanding"
-    ],
-    strengths=[
-        "Understanding of basic concepts",
-        "Good at memorizing processes"
-    ]
-)
+    # Example 2: Personalized written questions
+    personalized_result = app.generate_questions(
+        book_title="chemistry9_10",
+        chapter_num="Eight",
+        question_type="written",
+        num_questions=3,
+        weaknesses=[
+            "Lacks specific details about the number of divisions and cells produced",
+            "Missing specific terminology which is crucial for a complete understanding"
+        ],
+        strengths=[
+            "Understanding of basic concepts",
+            "Good at memorizing processes"
+        ]
+    )
 
-if personalized_result['success']:
-    app.print_sample_questions(personalized_result['questions'])
-    print(f"\nPersonalized questions saved to: {personalized_result['output_path']}")
-else:
-    print(f"Error: {personalized_result['error']}")
-    
-    
\ No newline at end of file
+    if personalized_result['success']:
+        app.print_sample_questions(personalized_result['questions'])
+        print(f"\nPersonalized questions saved to: {personalized_result['output_path']}")
+    else:
+        print(f"Error: {personalized_result['error']}")
\ No newline at end of file
@@ -1,15 +1,33 @@
 # ingest.py
 import os
+import argparse
 from pdf_processor import PDFProcessor
 from embeddings_manager import EmbeddingsManager
+from ingest_pipeline import IngestPipeline
+from chapter_store import ChapterStore
+from ttl_cache import invalidate_book
 from config import Config
 
 def main():
+    parser = argparse.ArgumentParser(description="Ingest PDFs from the data folder into the vector index")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-check every book even if its content is unchanged")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="Verify the local manifest against the index before ingesting")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Parse, embed and upsert concurrently with bounded memory")
+    args = parser.parse_args()
+
     print("PDF Ingestion Process with Chunking")
     print("----------------------------------")
     
     pdf_processor = PDFProcessor()
-    embeddings_manager = EmbeddingsManager()
+    embeddings_manager = EmbeddingsManager.shared()
+    chapter_store = ChapterStore()
+    
+    if args.pipeline:
+        run_pipeline(embeddings_manager, chapter_store, args)
+        return
     
     all_chapters = pdf_processor.process_pdf_folder()
     
@@ -25,7 +43,30 @@ def main():
         total_chunks = sum(len(chunks) for chunks in chapters.values())
         print(f"Created {total_chunks} chunks from content")
         
+        if args.reconcile:
+            dropped = embeddings_manager.reconcile_manifest(book_title)
+            print(f"Reconciled manifest, dropped {dropped} stale entries")
+        
+        fingerprint = embeddings_manager.manifest.fingerprint_chapters(chapters)
+        unchanged = embeddings_manager.manifest.is_book_unchanged(book_title, fingerprint)
+        if not unchanged or not chapter_store.has_book(book_title):
+            chapter_store.save_book(book_title, chapters)
+        if unchanged and not embeddings_manager.catalog.has_book(book_title):
+            embeddings_manager.catalog.update_book(book_title, chapters)
+        
+        if not args.force and unchanged:
+            print("Book unchanged since last ingest, skipping")
+            continue
+        
         embeddings_manager.create_embeddings(chapters, book_title)
+        pruned = embeddings_manager.prune_stale_chunks(
+            book_title, embeddings_manager.manifest.chunk_keys(chapters)
+        )
+        if pruned:
+            print(f"Removed {pruned} chunks no longer in the book")
+        embeddings_manager.manifest.mark_book(book_title, fingerprint, total_chunks)
+        embeddings_manager.catalog.update_book(book_title, chapters)
+        invalidate_book(book_title)
     
     print("\nAvailable chapters in Pinecone:")
     for book in all_chapters.keys():
@@ -35,5 +76,27 @@ def main():
         for chap in chapters:
             print(f"- {chap}")
 
+def run_pipeline(embeddings_manager: EmbeddingsManager, chapter_store: ChapterStore, args):
+    if not PDFProcessor.list_pdfs():
+        print(f"No PDFs found in {Config.DATA_FOLDER}")
+        return
+    
+    if args.reconcile:
+        for pdf_path in PDFProcessor.list_pdfs():
+            book_title = os.path.splitext(os.path.basename(pdf_path))[0]
+            dropped = embeddings_manager.reconcile_manifest(book_title)
+            print(f"Reconciled manifest for {book_title}, dropped {dropped} stale entries")
+    
+    pipeline = IngestPipeline(embeddings_manager, chapter_store, force=args.force)
+    stats = pipeline.run()
+    print(f"\nParsed {stats['books']} books ({stats['skipped_books']} unchanged)")
+    print(f"Processed {stats['existing_chunks']} existing chunks, added {stats['new_chunks']} new chunks")
+    
+    print("\nAvailable chapters in Pinecone:")
+    for book_title in pipeline.ingested_books:
+        print(f"\nBook: {book_title}")
+        for chap in embeddings_manager.list_available_chapters(book_title):
+            print(f"- {chap}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
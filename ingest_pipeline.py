@@ -0,0 +1,168 @@
+# ingest_pipeline.py
+import os
+import multiprocessing
+import queue
+import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Tuple
+from pdf_processor import PDFProcessor
+from embeddings_manager import EmbeddingsManager
+from chapter_store import ChapterStore
+from ttl_cache import invalidate_book
+from config import Config
+
+_BOOK_DONE = object()
+_STOP = object()
+
+def _parse_book(pdf_path: str) -> Tuple[str, Dict[str, List[str]]]:
+    """Worker entry point: parse and chunk one PDF in a separate process"""
+    # Books are already spread across the pool, so pages are extracted serially here
+    return os.path.splitext(os.path.basename(pdf_path))[0], PDFProcessor.process_pdf(pdf_path, workers=1)
+
+class IngestPipeline:
+    """
+    Streaming ingest: PDFs are parsed in a process pool, their chapters flow
+    through a bounded queue into a single batched embedder, and upserts run on
+    a thread pool while later books are still being parsed. Only a bounded
+    number of books is ever held in memory at once.
+    """
+
+    def __init__(self, embeddings_manager: EmbeddingsManager, chapter_store: ChapterStore, force: bool = False):
+        self.embeddings_manager = embeddings_manager
+        self.chapter_store = chapter_store
+        self.force = force
+        self.logger = logging.getLogger(__name__)
+        self.queue = queue.Queue(maxsize=Config.INGEST_QUEUE_SIZE)
+        self.upsert_executor = ThreadPoolExecutor(max_workers=Config.INGEST_UPSERT_WORKERS)
+        self.stats = {"books": 0, "skipped_books": 0, "existing_chunks": 0, "new_chunks": 0, "pruned_chunks": 0}
+        self.ingested_books: List[str] = []
+        self._error = None
+
+    def run(self, data_folder: str = None) -> Dict[str, int]:
+        pdf_paths = PDFProcessor.list_pdfs(data_folder)
+        embedder = threading.Thread(target=self._embed_loop, name="ingest-embedder", daemon=True)
+        embedder.start()
+
+        try:
+            self._parse_all(pdf_paths)
+        finally:
+            self.queue.put(_STOP)
+            embedder.join()
+            self.upsert_executor.shutdown(wait=True)
+
+        if self._error:
+            raise self._error
+        return self.stats
+
+    def _parse_all(self, pdf_paths: List[str]):
+        workers = Config.INGEST_PARSE_WORKERS
+        pending_paths = list(pdf_paths)
+        # The embedder and upsert threads are already running, and forking a
+        # process with live threads (and their held locks) can deadlock the child
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            # Keep at most one book per worker in flight so parsed-but-unqueued
+            # books can't pile up while the embedder applies backpressure
+            in_flight = set()
+            while pending_paths or in_flight:
+                while pending_paths and len(in_flight) < workers:
+                    in_flight.add(executor.submit(_parse_book, pending_paths.pop(0)))
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if self._error:
+                        return
+                    book_title, chapters = future.result()
+                    self._enqueue_book(book_title, chapters)
+
+    def _enqueue_book(self, book_title: str, chapters: Dict[str, List[str]]):
+        total_chunks = sum(len(chunks) for chunks in chapters.values())
+        self.logger.info(f"Parsed {book_title}: {len(chapters)} chapters, {total_chunks} chunks")
+        self.stats["books"] += 1
+
+        manifest = self.embeddings_manager.manifest
+        fingerprint = manifest.fingerprint_chapters(chapters)
+        unchanged = manifest.is_book_unchanged(book_title, fingerprint)
+        if not unchanged or not self.chapter_store.has_book(book_title):
+            self.chapter_store.save_book(book_title, chapters)
+        if unchanged and not self.embeddings_manager.catalog.has_book(book_title):
+            self.embeddings_manager.catalog.update_book(book_title, chapters)
+
+        if not self.force and unchanged:
+            self.logger.info(f"{book_title} unchanged since last ingest, skipping")
+            self.stats["skipped_books"] += 1
+            return
+
+        for chapter_name, chunks in chapters.items():
+            self.queue.put((book_title, chapter_name, chunks))
+        summary = self.embeddings_manager.catalog.summarize(chapters)
+        current_keys = manifest.chunk_keys(chapters)
+        self.queue.put((_BOOK_DONE, book_title, fingerprint, total_chunks, summary, current_keys))
+
+    def _embed_loop(self):
+        buffer: List[Tuple[str, Tuple]] = []
+        book_futures: Dict[str, list] = {}
+        # The manifest's chunk hashes, read once per book rather than once per chapter
+        known_hashes: Dict[str, set] = {}
+
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            if self._error:
+                continue
+
+            try:
+                if item[0] is _BOOK_DONE:
+                    _, book_title, fingerprint, total_chunks, summary, current_keys = item
+                    self._flush(buffer, book_futures)
+                    buffer = []
+                    for future in book_futures.pop(book_title, []):
+                        future.result()
+                    known_hashes.pop(book_title, None)
+                    self.stats["pruned_chunks"] += self.embeddings_manager.prune_stale_chunks(book_title, current_keys)
+                    self.embeddings_manager.manifest.mark_book(book_title, fingerprint, total_chunks)
+                    self.embeddings_manager.catalog.set_book(book_title, summary)
+                    invalidate_book(book_title)
+                    self.ingested_books.append(book_title)
+                    continue
+
+                book_title, chapter_name, chunks = item
+                if book_title not in known_hashes:
+                    known_hashes[book_title] = self.embeddings_manager.manifest.existing_hashes(book_title)
+                pending, existing_count = self.embeddings_manager.find_new_chunks(
+                    {chapter_name: chunks}, book_title, known=known_hashes[book_title]
+                )
+                self.stats["existing_chunks"] += existing_count
+                buffer.extend((book_title, entry) for entry in pending)
+
+                if len(buffer) >= Config.UPSERT_BATCH_SIZE:
+                    self._flush(buffer, book_futures)
+                    buffer = []
+            except Exception as e:
+                self.logger.error(f"Ingest pipeline failed: {str(e)}")
+                self._error = e
+
+    def _flush(self, buffer: List[Tuple[str, Tuple]], book_futures: Dict[str, list]):
+        """Encode the buffered chunks in one batch and hand the upserts to the pool"""
+        if not buffer:
+            return
+        embeddings = self.embeddings_manager.encode_chunks([entry[2] for _, entry in buffer])
+        self.stats["new_chunks"] += len(buffer)
+
+        by_book: Dict[str, List[int]] = {}
+        for row, (book_title, _) in enumerate(buffer):
+            by_book.setdefault(book_title, []).append(row)
+
+        batch_size = Config.UPSERT_BATCH_SIZE
+        for book_title, rows in by_book.items():
+            for start in range(0, len(rows), batch_size):
+                batch_rows = rows[start:start + batch_size]
+                book_futures.setdefault(book_title, []).append(
+                    self.upsert_executor.submit(
+                        self.embeddings_manager.upsert_chunks,
+                        book_title,
+                        [buffer[row][1] for row in batch_rows],
+                        embeddings[batch_rows]
+                    )
+                )
@@ -0,0 +1,105 @@
+# llm_gateway.py
+import asyncio
+import logging
+import time
+import weakref
+from typing import AsyncIterator
+import httpx
+from openai import AsyncOpenAI
+from config import Config
+from llm_scheduler import get_scheduler
+from telemetry import telemetry
+
+class LLMGateway:
+    """
+    Async OpenRouter client sharing one pooled HTTP connection pool, with a
+    semaphore bounding how many completions are in flight at once
+    """
+
+    def __init__(self, max_concurrency: int = None):
+        self.logger = logging.getLogger(__name__)
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=Config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.LLM_MAX_CONNECTIONS
+            ),
+            timeout=Config.LLM_TIMEOUT
+        )
+        self.client = AsyncOpenAI(
+            base_url=Config.OPENROUTER_BASE_URL,
+            api_key=Config.OPENROUTER_API_KEY,
+            http_client=self.http_client,
+            max_retries=0  # retries are handled by the shared LLM scheduler
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency or Config.LLM_MAX_CONCURRENCY)
+
+    async def complete(self, prompt: str, temperature: float = 0.7, max_tokens: int = None,
+                       component: str = "gateway") -> str:
+        max_tokens = max_tokens or Config.LLM_MAX_OUTPUT_TOKENS
+
+        async def call():
+            async with self.semaphore:
+                return await self._create(prompt, temperature, max_tokens)
+
+        try:
+            completion = await get_scheduler().arun(call, prompt, max_tokens, temperature, component=component)
+            return completion.choices[0].message.content
+        except Exception as e:
+            self.logger.error(f"LLM API call failed: {str(e)}")
+            raise
+
+    async def stream(self, prompt: str, temperature: float = 0.7, max_tokens: int = None,
+                     component: str = "gateway") -> AsyncIterator[str]:
+        """Yield completion text as it arrives; closing the iterator early aborts the request"""
+        max_tokens = max_tokens or Config.LLM_MAX_OUTPUT_TOKENS
+        async with self.semaphore:
+            try:
+                stream = await get_scheduler().arun(
+                    lambda: self._create(prompt, temperature, max_tokens, stream=True),
+                    prompt, max_tokens, temperature, coalesce=False, component=component
+                )
+            except Exception as e:
+                self.logger.error(f"LLM API call failed: {str(e)}")
+                raise
+            # llm.call only covers opening the stream; llm.stream times the body up to the final chunk
+            start = time.perf_counter()
+            try:
+                async for event in stream:
+                    if event.usage:
+                        telemetry.record_usage(component, event.usage)
+                    if event.choices and event.choices[0].delta.content:
+                        yield event.choices[0].delta.content
+            finally:
+                await stream.close()
+                telemetry.record_span("llm.stream", time.perf_counter() - start, component=component)
+
+    async def _create(self, prompt: str, temperature: float, max_tokens: int, stream: bool = False):
+        return await self.client.chat.completions.create(
+            extra_headers={
+                "HTTP-Referer": Config.SITE_URL,
+                "X-Title": Config.SITE_NAME,
+            },
+            model=Config.LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=stream,
+            # Streams only report token usage in a final chunk when asked to
+            **({"stream_options": {"include_usage": True}} if stream else {})
+        )
+
+    async def aclose(self):
+        await self.client.close()
+
+# httpx clients and asyncio primitives belong to the loop they were created on,
+# so the shared gateway is one instance per running event loop
+_gateways: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LLMGateway]" = weakref.WeakKeyDictionary()
+
+def get_gateway() -> LLMGateway:
+    """Return the process-wide gateway for the current event loop"""
+    loop = asyncio.get_running_loop()
+    gateway = _gateways.get(loop)
+    if gateway is None:
+        gateway = LLMGateway()
+        _gateways[loop] = gateway
+    return gateway
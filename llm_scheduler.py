@@ -0,0 +1,201 @@
+# llm_scheduler.py
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, List, TypeVar
+import openai
+from config import Config
+from fingerprint import stable_hash
+from telemetry import telemetry
+from token_counter import get_token_counter
+
+T = TypeVar("T")
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `per_minute`. Callers
+    reserve what they need up front and are told how long to wait before
+    using it, so the same bucket serves threads and coroutines.
+    A limit of 0 (or None) disables the bucket.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute or 0
+        self.rate = self.capacity / 60.0
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take `amount` from the bucket and return the seconds to wait before proceeding"""
+        if not self.capacity:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+class LLMScheduler:
+    """
+    Process-wide gate in front of every LLM call: token buckets for requests
+    and tokens per minute, jittered exponential retry on rate limits, server
+    errors and dropped connections, and coalescing of identical in-flight
+    prompts so concurrent duplicates share one upstream call.
+    """
+
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None,
+                 max_retries: int = None):
+        self.logger = logging.getLogger(__name__)
+        self.request_bucket = TokenBucket(
+            Config.LLM_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        )
+        self.token_bucket = TokenBucket(
+            Config.LLM_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute
+        )
+        self.max_retries = Config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._async_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, List]]" = \
+            weakref.WeakKeyDictionary()
+        self.stats = {"calls": 0, "retries": 0, "coalesced": 0, "throttled_seconds": 0.0}
+
+    def run(self, call: Callable[[], T], prompt: str, max_tokens: int, temperature: float,
+            coalesce: bool = True, component: str = "llm") -> T:
+        """Run a blocking LLM call under the rate limits, retrying transient failures"""
+        if not coalesce:
+            return self._execute(call, prompt, max_tokens, component)
+
+        key = self._request_key(prompt, max_tokens, temperature)
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            future.set_result(self._execute(call, prompt, max_tokens, component))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future.result()
+
+    async def arun(self, call: Callable[[], Awaitable[T]], prompt: str, max_tokens: int, temperature: float,
+                   coalesce: bool = True, component: str = "llm") -> T:
+        """Async counterpart of run(); the shared call is cancelled once no caller is waiting on it"""
+        if not coalesce:
+            return await self._aexecute(call, prompt, max_tokens, component)
+
+        key = self._request_key(prompt, max_tokens, temperature)
+        inflight = self._async_inflight.setdefault(asyncio.get_running_loop(), {})
+        entry = inflight.get(key)
+        if entry is None:
+            entry = inflight[key] = [asyncio.ensure_future(self._aexecute(call, prompt, max_tokens, component)), 0]
+            entry[0].add_done_callback(lambda _: inflight.pop(key, None) if inflight.get(key) is entry else None)
+        else:
+            self._count("coalesced")
+
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                entry[0].cancel()
+
+    def _execute(self, call: Callable[[], T], prompt: str, max_tokens: int, component: str) -> T:
+        for attempt in range(self.max_retries + 1):
+            delay = self._reserve(prompt, max_tokens)
+            telemetry.record_span("llm.queue", delay, component=component)
+            if delay:
+                time.sleep(delay)
+            try:
+                self._count("calls")
+                with telemetry.span("llm.call", component=component):
+                    result = call()
+                telemetry.record_usage(component, getattr(result, "usage", None))
+                return result
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                self._log_retry(e, attempt)
+                time.sleep(self._backoff(e, attempt))
+
+    async def _aexecute(self, call: Callable[[], Awaitable[T]], prompt: str, max_tokens: int, component: str) -> T:
+        for attempt in range(self.max_retries + 1):
+            delay = self._reserve(prompt, max_tokens)
+            telemetry.record_span("llm.queue", delay, component=component)
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                self._count("calls")
+                with telemetry.span("llm.call", component=component):
+                    result = await call()
+                telemetry.record_usage(component, getattr(result, "usage", None))
+                return result
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                self._log_retry(e, attempt)
+                await asyncio.sleep(self._backoff(e, attempt))
+
+    def _reserve(self, prompt: str, max_tokens: int) -> float:
+        tokens = get_token_counter().count(prompt) + max_tokens if self.token_bucket.capacity else 0
+        delay = max(self.request_bucket.reserve(1), self.token_bucket.reserve(tokens))
+        if delay:
+            self._count("throttled_seconds", delay)
+        return delay
+
+    def _log_retry(self, error: Exception, attempt: int):
+        self._count("retries")
+        self.logger.warning(f"LLM call failed ({str(error)}), retry {attempt + 1} of {self.max_retries}")
+
+    def _count(self, stat: str, amount: float = 1):
+        # Updated from worker threads and the event loop alike
+        with self._lock:
+            self.stats[stat] += amount
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, openai.APIConnectionError):
+            return True
+        status = getattr(error, "status_code", None)
+        return status == 429 or (status is not None and status >= 500)
+
+    @staticmethod
+    def _backoff(error: Exception, attempt: int) -> float:
+        """Full-jitter exponential backoff, never shorter than a server's Retry-After"""
+        delay = random.uniform(0, min(Config.LLM_RETRY_MAX_DELAY, Config.LLM_RETRY_BASE_DELAY * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:
+            return delay
+
+    @staticmethod
+    def _request_key(prompt: str, max_tokens: int, temperature: float) -> str:
+        return stable_hash(prompt, Config.LLM_MODEL, max_tokens, temperature)
+
+_shared_scheduler = None
+_shared_lock = threading.Lock()
+
+def get_scheduler() -> LLMScheduler:
+    """Process-wide scheduler, so every caller shares the same rate limits"""
+    global _shared_scheduler
+    if _shared_scheduler is None:
+        with _shared_lock:
+            if _shared_scheduler is None:
+                _shared_scheduler = LLMScheduler()
+    return _shared_scheduler
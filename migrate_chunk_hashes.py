@@ -0,0 +1,79 @@
+# migrate_chunk_hashes.py
+"""
+Re-key existing index metadata from the old process-random hash() values to
+the stable fingerprints in fingerprint.py, rebuild the local manifest, and
+optionally delete the duplicate vectors that earlier re-ingests created.
+
+Enumerating ids relies on index.list(), which is available on serverless
+Pinecone indexes.
+"""
+import argparse
+from typing import Dict, List, Tuple
+from embeddings_manager import EmbeddingsManager
+from fingerprint import chunk_hash
+from config import Config
+
+def migrate(embeddings_manager: EmbeddingsManager, dry_run: bool = False, dedupe: bool = False) -> Dict[str, int]:
+    index = embeddings_manager.index
+    stats = {"scanned": 0, "rekeyed": 0, "duplicates": 0}
+    seen: Dict[Tuple[str, str, str], str] = {}
+    duplicates: List[str] = []
+
+    for id_batch in index.list():
+        id_batch = list(id_batch)
+        for start in range(0, len(id_batch), Config.FETCH_BATCH_SIZE):
+            response = index.fetch(ids=id_batch[start:start + Config.FETCH_BATCH_SIZE])
+            manifest_rows: Dict[str, List[Tuple[str, str, str, int]]] = {}
+
+            for vector_id, vector in response.vectors.items():
+                metadata = vector.metadata or {}
+                if "text" not in metadata:
+                    continue
+                stats["scanned"] += 1
+
+                book = metadata.get("book", "")
+                chapter = metadata.get("chapter", "")
+                new_hash = chunk_hash(metadata["text"])
+
+                key = (book, chapter, new_hash)
+                if key in seen:
+                    duplicates.append(vector_id)
+                    continue
+                seen[key] = vector_id
+
+                if metadata.get("chunk_hash") != new_hash:
+                    stats["rekeyed"] += 1
+                    if not dry_run:
+                        index.update(id=vector_id, set_metadata={"chunk_hash": new_hash})
+
+                manifest_rows.setdefault(book, []).append(
+                    (chapter, new_hash, vector_id, int(metadata.get("chunk_index", 0)))
+                )
+
+            if not dry_run:
+                for book, rows in manifest_rows.items():
+                    embeddings_manager.manifest.record_chunks(book, rows)
+
+    stats["duplicates"] = len(duplicates)
+    if dedupe and not dry_run:
+        for start in range(0, len(duplicates), Config.FETCH_BATCH_SIZE):
+            index.delete(ids=duplicates[start:start + Config.FETCH_BATCH_SIZE])
+
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-key index chunk hashes with stable fingerprints")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing anything")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Delete vectors that duplicate an already-seen (book, chapter, chunk) fingerprint")
+    args = parser.parse_args()
+
+    stats = migrate(EmbeddingsManager.shared(), dry_run=args.dry_run, dedupe=args.dedupe)
+    action = "Would re-key" if args.dry_run else "Re-keyed"
+    print(f"Scanned {stats['scanned']} vectors")
+    print(f"{action} {stats['rekeyed']} chunk hashes")
+    print(f"Found {stats['duplicates']} duplicate vectors"
+          + (" (deleted)" if args.dedupe and not args.dry_run else ""))
+
+if __name__ == "__main__":
+    main()
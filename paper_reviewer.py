@@ -3,15 +3,21 @@ from typing import Dict, List, Optional
 from config import Config
 import re
 import logging
+import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from diskcache import Cache
+from fingerprint import object_hash
+from llm_gateway import get_gateway
+from llm_scheduler import get_scheduler
+from telemetry import telemetry
 import textstat
 
 class ExamPaperReviewer:
     def __init__(self):
         self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
+            base_url=Config.OPENROUTER_BASE_URL,
             api_key=Config.OPENROUTER_API_KEY,
+            max_retries=0  # retries are handled by the shared LLM scheduler
         )
         self.logger = logging.getLogger(__name__)
         self.cache = Cache(Config.REVIEW_CACHE_DIR)
@@ -28,57 +34,183 @@ class ExamPaperReviewer:
         if not questions:
             raise ValueError("No questions provided for review")
             
-        cache_key = f"exam_review_{hash(str(questions))}"
-        if cache_key in self.cache:
-            return self.cache[cache_key]
+        cache_key = self._paper_cache_key(questions)
+        cached = self._cached("review_papers", cache_key)
+        if cached is not None:
+            return cached
             
         try:
-            results = {
-                "questions": [],
-                "overall_score": 0,
-                "feedback_summary": {
-                    "strengths": [],
-                    "weaknesses": [],
-                    "suggestions": []
-                }
-            }
+            workers = max(1, min(Config.REVIEW_MAX_WORKERS, len(questions)))
+            with telemetry.span("review.paper"), ThreadPoolExecutor(max_workers=workers) as executor:
+                question_results = list(executor.map(self.review_paper_question, questions))
             
-            total_score = 0
-            total_possible = 0
+            results = self.aggregate_results(questions, question_results)
+            if not results["failed_questions"]:
+                self.cache[cache_key] = results
+            return results
             
-            for i, q in enumerate(questions):
-                question_result = self._review_question(
-                    question=q.get('question', ''),
-                    sample_solution=q.get('model_answer', ''),
-                    user_solution=q.get('student_answer', ''),
-                    max_marks=q.get('marks', 1)  
-                )
-                
-                results["questions"].append(question_result)
-                total_score += question_result["score"]
-                total_possible += q.get('marks', 1)
-                
-                if i < 3:  
-                    results["feedback_summary"]["strengths"].extend(
-                        question_result["strengths"][:1]
-                    )
-                    results["feedback_summary"]["weaknesses"].extend(
-                        question_result["weaknesses"][:1]
-                    )
-                    results["feedback_summary"]["suggestions"].extend(
-                        question_result["suggestions"][:1]
-                    )
+        except Exception as e:
+            self.logger.error(f"Exam paper review failed: {str(e)}")
+            raise
+
+    async def areview_exam_paper(self, questions: List[Dict[str, str]]) -> Dict:
+        """Async variant of review_exam_paper that grades every question concurrently"""
+        if not questions:
+            raise ValueError("No questions provided for review")
             
-            if total_possible > 0:
-                results["overall_score"] = round((total_score / total_possible) * 100, 1)
+        cache_key = self._paper_cache_key(questions)
+        cached = self._cached("review_papers", cache_key)
+        if cached is not None:
+            return cached
             
-            self.cache[cache_key] = results
+        try:
+            with telemetry.span("review.paper"):
+                question_results = await asyncio.gather(*[
+                    self._areview_paper_question(q) for q in questions
+                ])
+            
+            results = self.aggregate_results(questions, question_results)
+            if not results["failed_questions"]:
+                self.cache[cache_key] = results
             return results
             
         except Exception as e:
             self.logger.error(f"Exam paper review failed: {str(e)}")
             raise
 
+    def review_paper_question(self, q: Dict[str, str]) -> Dict:
+        """Grade one question of a paper, reusing cached grades and isolating failures"""
+        cache_key = self.question_cache_key(q)
+        cached = self._cached("review_questions", cache_key)
+        if cached is not None:
+            return cached
+            
+        try:
+            result = self._review_question(
+                question=q.get('question', ''),
+                sample_solution=q.get('model_answer', ''),
+                user_solution=q.get('student_answer', ''),
+                max_marks=q.get('marks', 1)  
+            )
+        except Exception as e:
+            self.logger.warning(f"Question review failed: {str(e)}")
+            return self._failed_question_result(e)
+            
+        self.cache[cache_key] = result
+        return result
+
+    async def _areview_paper_question(self, q: Dict[str, str]) -> Dict:
+        """Async counterpart of review_paper_question"""
+        cache_key = self.question_cache_key(q)
+        cached = self._cached("review_questions", cache_key)
+        if cached is not None:
+            return cached
+            
+        try:
+            result = await self._areview_question(
+                question=q.get('question', ''),
+                sample_solution=q.get('model_answer', ''),
+                user_solution=q.get('student_answer', ''),
+                max_marks=q.get('marks', 1)
+            )
+        except Exception as e:
+            self.logger.warning(f"Question review failed: {str(e)}")
+            return self._failed_question_result(e)
+            
+        self.cache[cache_key] = result
+        return result
+
+    def _cached(self, cache_name: str, cache_key: str) -> Optional[Dict]:
+        """Cached review or None; every lookup counts towards the hit ratio"""
+        result = self.cache.get(cache_key)
+        telemetry.record_cache(cache_name, hit=result is not None)
+        return result
+
+    @staticmethod
+    def _paper_cache_key(questions: List[Dict[str, str]]) -> str:
+        return f"exam_review_{object_hash(questions, Config.LLM_MODEL, Config.EXAM_QUESTION_REVIEW_TEMPLATE)}"
+
+    def cached_grade(self, q: Dict[str, str]) -> Optional[Dict]:
+        """Cached grade of one answer, whether it was graded on its own or packed with others"""
+        result = self.cache.get(self.question_cache_key(q))
+        if result is None:
+            result = self.cache.get(self.batch_cache_key(q))
+        telemetry.record_cache("review_questions", hit=result is not None)
+        return result
+
+    @staticmethod
+    def _graded_fields(q: Dict[str, str]) -> Dict:
+        return {
+            "question": q.get('question', ''),
+            "model_answer": q.get('model_answer', ''),
+            "student_answer": q.get('student_answer', ''),
+            "marks": q.get('marks', 1)
+        }
+
+    @staticmethod
+    def question_cache_key(q: Dict[str, str]) -> str:
+        """Per-answer key, so editing one answer only re-grades that answer"""
+        graded_fields = ExamPaperReviewer._graded_fields(q)
+        return f"exam_question_{object_hash(graded_fields, Config.LLM_MODEL, Config.EXAM_QUESTION_REVIEW_TEMPLATE)}"
+
+    @staticmethod
+    def batch_cache_key(q: Dict[str, str]) -> str:
+        """Per-answer key for grades from a packed prompt, which uses its own template"""
+        graded_fields = ExamPaperReviewer._graded_fields(q)
+        return f"exam_batch_question_{object_hash(graded_fields, Config.LLM_MODEL, Config.EXAM_BATCH_REVIEW_TEMPLATE)}"
+
+    @staticmethod
+    def _failed_question_result(error: Exception) -> Dict:
+        return {
+            "score": 0,
+            "marks_awarded": 0,
+            "strengths": [],
+            "weaknesses": [],
+            "suggestions": [],
+            "detailed_feedback": "",
+            "error": str(error)
+        }
+
+    @staticmethod
+    def aggregate_results(questions: List[Dict[str, str]], question_results: List[Dict]) -> Dict:
+        """Combine per-question reviews into the paper-level result"""
+        results = {
+            "questions": [],
+            "overall_score": 0,
+            "failed_questions": 0,
+            "feedback_summary": {
+                "strengths": [],
+                "weaknesses": [],
+                "suggestions": []
+            }
+        }
+        
+        total_score = 0
+        total_possible = 0
+        
+        for i, (q, question_result) in enumerate(zip(questions, question_results)):
+            results["questions"].append(question_result)
+            if "error" in question_result:
+                results["failed_questions"] += 1
+            total_score += question_result["score"]
+            total_possible += q.get('marks', 1)
+            
+            if i < 3:  
+                results["feedback_summary"]["strengths"].extend(
+                    question_result["strengths"][:1]
+                )
+                results["feedback_summary"]["weaknesses"].extend(
+                    question_result["weaknesses"][:1]
+                )
+                results["feedback_summary"]["suggestions"].extend(
+                    question_result["suggestions"][:1]
+                )
+        
+        if total_possible > 0:
+            results["overall_score"] = round((total_score / total_possible) * 100, 1)
+        
+        return results
+
     def _review_question(self, question: str, sample_solution: str, user_solution: str, max_marks: int = 1) -> Dict:
         """Review a single exam question and answer"""
         prompt = Config.EXAM_QUESTION_REVIEW_TEMPLATE.format(
@@ -87,21 +219,38 @@ class ExamPaperReviewer:
             user_solution=user_solution
         )
         
-        response = self._call_llm(prompt)
-        return self._parse_question_response(response, max_marks)
+        response = self.call_llm(prompt)
+        with telemetry.span("review.parse"):
+            return self.parse_question_response(response, max_marks)
+
+    async def _areview_question(self, question: str, sample_solution: str, user_solution: str, max_marks: int = 1) -> Dict:
+        """Async counterpart of _review_question using the shared LLM gateway"""
+        prompt = Config.EXAM_QUESTION_REVIEW_TEMPLATE.format(
+            question=question,
+            sample_solution=sample_solution,
+            user_solution=user_solution
+        )
+        
+        response = await get_gateway().complete(prompt, temperature=0.2, component="paper_reviewer")
+        with telemetry.span("review.parse"):
+            return self.parse_question_response(response, max_marks)
 
-    def _call_llm(self, prompt: str) -> str:
+    def call_llm(self, prompt: str, max_tokens: int = None) -> str:
         """Make API call to LLM"""
+        max_tokens = max_tokens or Config.LLM_MAX_OUTPUT_TOKENS
         try:
-            completion = self.client.chat.completions.create(
-                extra_headers={
-                    "HTTP-Referer": Config.SITE_URL,
-                    "X-Title": Config.SITE_NAME,
-                },
-                model=Config.LLM_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,  
-                max_tokens=2000
+            completion = get_scheduler().run(
+                lambda: self.client.chat.completions.create(
+                    extra_headers={
+                        "HTTP-Referer": Config.SITE_URL,
+                        "X-Title": Config.SITE_NAME,
+                    },
+                    model=Config.LLM_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.2,
+                    max_tokens=max_tokens
+                ),
+                prompt, max_tokens, 0.2, component="paper_reviewer"
             )
             return completion.choices[0].message.content
         except Exception as e:
@@ -109,7 +258,7 @@ class ExamPaperReviewer:
             raise
 
     @staticmethod
-    def _parse_question_response(text: str, max_marks: int) -> Dict:
+    def parse_question_response(text: str, max_marks: int) -> Dict:
         """Parse the response for a single question review"""
         result = {
             "score": 0,
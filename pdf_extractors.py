@@ -0,0 +1,146 @@
+# pdf_extractors.py
+import logging
+import math
+import multiprocessing
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Type
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class PDFExtractor(ABC):
+    """Backend that turns a range of PDF pages into plain text, one string per page"""
+    name = None
+
+    @staticmethod
+    @abstractmethod
+    def is_available() -> bool:
+        """Whether the backend's library can be imported"""
+
+    @abstractmethod
+    def page_count(self, pdf_path: str) -> int:
+        """Number of pages in the document"""
+
+    @abstractmethod
+    def extract_pages(self, pdf_path: str, start: int, end: int) -> List[str]:
+        """Text of pages [start, end)"""
+
+class PyMuPDFExtractor(PDFExtractor):
+    name = "pymupdf"
+
+    @staticmethod
+    def _module():
+        try:
+            import pymupdf
+        except ImportError:
+            import fitz as pymupdf
+        return pymupdf
+
+    @staticmethod
+    def is_available() -> bool:
+        try:
+            PyMuPDFExtractor._module()
+            return True
+        except ImportError:
+            return False
+
+    def page_count(self, pdf_path: str) -> int:
+        with self._module().open(pdf_path) as doc:
+            return doc.page_count
+
+    def extract_pages(self, pdf_path: str, start: int, end: int) -> List[str]:
+        with self._module().open(pdf_path) as doc:
+            return [doc[i].get_text() for i in range(start, min(end, doc.page_count))]
+
+class PyPDF2Extractor(PDFExtractor):
+    name = "pypdf2"
+
+    @staticmethod
+    def is_available() -> bool:
+        try:
+            import PyPDF2
+            return True
+        except ImportError:
+            return False
+
+    def page_count(self, pdf_path: str) -> int:
+        import PyPDF2
+        with open(pdf_path, 'rb') as file:
+            return len(PyPDF2.PdfReader(file).pages)
+
+    def extract_pages(self, pdf_path: str, start: int, end: int) -> List[str]:
+        import PyPDF2
+        with open(pdf_path, 'rb') as file:
+            pages = PyPDF2.PdfReader(file).pages
+            return [pages[i].extract_text() or '' for i in range(start, min(end, len(pages)))]
+
+class PdfPlumberExtractor(PDFExtractor):
+    name = "pdfplumber"
+
+    @staticmethod
+    def is_available() -> bool:
+        try:
+            import pdfplumber
+            return True
+        except ImportError:
+            return False
+
+    def page_count(self, pdf_path: str) -> int:
+        import pdfplumber
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+
+    def extract_pages(self, pdf_path: str, start: int, end: int) -> List[str]:
+        import pdfplumber
+        with pdfplumber.open(pdf_path) as pdf:
+            return [pdf.pages[i].extract_text() or '' for i in range(start, min(end, len(pdf.pages)))]
+
+EXTRACTORS: Dict[str, Type[PDFExtractor]] = {
+    PyMuPDFExtractor.name: PyMuPDFExtractor,
+    PyPDF2Extractor.name: PyPDF2Extractor,
+    PdfPlumberExtractor.name: PdfPlumberExtractor,
+}
+
+def get_extractor(name: str = None) -> PDFExtractor:
+    """Return the requested backend, falling back to PyPDF2 if it isn't installed"""
+    name = name or Config.PDF_EXTRACTOR
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown PDF extractor '{name}'. Choose from {list(EXTRACTORS)}")
+
+    extractor_cls = EXTRACTORS[name]
+    if not extractor_cls.is_available():
+        logger.warning(f"PDF extractor '{name}' is not installed, falling back to '{PyPDF2Extractor.name}'")
+        extractor_cls = PyPDF2Extractor
+    return extractor_cls()
+
+def _extract_range(name: str, pdf_path: str, start: int, end: int) -> List[str]:
+    """Worker entry point for page-range extraction in a separate process"""
+    return get_extractor(name).extract_pages(pdf_path, start, end)
+
+def extract_pages(pdf_path: str, extractor: str = None, workers: int = None) -> List[str]:
+    """
+    Extract every page of a PDF as text. Large documents are split into page
+    ranges that are extracted in parallel worker processes.
+    """
+    backend = get_extractor(extractor)
+    total_pages = backend.page_count(pdf_path)
+    workers = workers or Config.PDF_EXTRACT_WORKERS
+
+    if workers <= 1 or total_pages < Config.PDF_PARALLEL_MIN_PAGES:
+        return backend.extract_pages(pdf_path, 0, total_pages)
+
+    pages_per_task = max(1, math.ceil(total_pages / workers))
+    ranges = [(start, start + pages_per_task) for start in range(0, total_pages, pages_per_task)]
+
+    pages = []
+    # Spawn rather than fork: callers such as the ingest pipeline run threads
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)),
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            executor.submit(_extract_range, backend.name, pdf_path, start, end)
+            for start, end in ranges
+        ]
+        for future in futures:
+            pages.extend(future.result())
+    return pages
@@ -1,13 +1,14 @@
 # pdf_processor.py
-import PyPDF2
 import re
 from typing import Dict, List, Tuple
 import os
 from config import Config
+from pdf_extractors import extract_pages
+from token_counter import estimate_token_counts
 
 class PDFProcessor:
     @staticmethod
-    def extract_chapters_from_pdf(pdf_path: str) -> Dict[str, List[str]]:
+    def extract_chapters_from_pdf(pdf_path: str, extractor: str = None, workers: int = None) -> Dict[str, List[str]]:
         """
         Extract chapters from PDF where chapters start with "Chapter X" or similar
         Returns a dictionary with chapter names as keys and content as lists of paragraphs
@@ -16,51 +17,55 @@ class PDFProcessor:
         current_chapter = None
         chapter_content = []
         
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
+        for text in extract_pages(pdf_path, extractor=extractor, workers=workers):
+            if not text:
+                continue
+                
+            lines = text.split('\n')
             
-            for page in reader.pages:
-                text = page.extract_text()
-                if not text:
+            for line in lines:
+                line = line.strip()
+                if not line:
                     continue
                     
-                lines = text.split('\n')
-                
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                        
-                    if re.match(r'^(Chapter\s+\d+|Chapter\s+[A-Za-z]+)', line):
-                        if current_chapter:
-                            chapters[current_chapter] = chapter_content
-                            chapter_content = []
-                        current_chapter = line
-                    elif current_chapter:
-                        chapter_content.append(line)
-            
-            # Add the last chapter
-            if current_chapter and chapter_content:
-                chapters[current_chapter] = chapter_content
+                if re.match(r'^(Chapter\s+\d+|Chapter\s+[A-Za-z]+)', line):
+                    if current_chapter:
+                        chapters[current_chapter] = chapter_content
+                        chapter_content = []
+                    # Extractors disagree on heading spacing (PyPDF2 yields "Chapter  One"),
+                    # so chapter keys are whitespace-normalized
+                    current_chapter = " ".join(line.split())
+                elif current_chapter:
+                    chapter_content.append(line)
+        
+        # Add the last chapter
+        if current_chapter and chapter_content:
+            chapters[current_chapter] = chapter_content
         
         return chapters
 
     @staticmethod
-    def chunk_content(content: List[str], min_chunk_size: int = 100, max_chunk_size: int = 500) -> List[str]:
+    def chunk_content(content: List[str], min_chunk_size: int = None, max_chunk_size: int = None) -> List[str]:
         """
-        Combine small paragraphs and split large ones to create consistent chunks
+        Combine small paragraphs and split large ones to create consistent chunks.
+        Sizes use the deterministic word-based token estimate, so the same PDF
+        always yields the same chunks (and fingerprints) whether or not the
+        LLM tokenizer is available
         """
+        min_chunk_size = min_chunk_size or Config.PDF_CHUNK_MIN_TOKENS
+        max_chunk_size = max_chunk_size or Config.PDF_CHUNK_MAX_TOKENS
+        para_sizes = estimate_token_counts(content)
+        
         chunks = []
         current_chunk = []
         current_size = 0
         
-        for paragraph in content:
-            para_size = len(paragraph.split())
-            
+        for paragraph, para_size in zip(content, para_sizes):
             if para_size > max_chunk_size:
                 words = paragraph.split()
-                for i in range(0, len(words), max_chunk_size):
-                    chunk = ' '.join(words[i:i+max_chunk_size])
+                words_per_chunk = max(1, int(len(words) * max_chunk_size / para_size))
+                for i in range(0, len(words), words_per_chunk):
+                    chunk = ' '.join(words[i:i+words_per_chunk])
                     chunks.append(chunk)
                 continue
                 
@@ -84,25 +89,40 @@ class PDFProcessor:
         return chunks
 
     @staticmethod
-    def process_pdf_folder(data_folder: str = None) -> Dict[str, Dict[str, List[str]]]:
+    def process_pdf(pdf_path: str, workers: int = None) -> Dict[str, List[str]]:
         """
-        Process all PDFs in a folder and return their chapter contents with chunking
+        Extract and chunk the chapters of a single PDF
+        """
+        chapters = PDFProcessor.extract_chapters_from_pdf(pdf_path, workers=workers)
+        
+        chunked_chapters = {}
+        for chapter_name, content in chapters.items():
+            chunked_chapters[chapter_name] = PDFProcessor.chunk_content(content)
+            
+        return chunked_chapters
+
+    @staticmethod
+    def list_pdfs(data_folder: str = None) -> List[str]:
+        """
+        Return the paths of all PDFs in a folder
         """
         if data_folder is None:
             data_folder = Config.DATA_FOLDER
             
+        return [
+            os.path.join(data_folder, filename)
+            for filename in sorted(os.listdir(data_folder))
+            if filename.endswith('.pdf')
+        ]
+
+    @staticmethod
+    def process_pdf_folder(data_folder: str = None) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Process all PDFs in a folder and return their chapter contents with chunking
+        """
         all_chapters = {}
         
-        for filename in os.listdir(data_folder):
-            if filename.endswith('.pdf'):
-                pdf_path = os.path.join(data_folder, filename)
-                chapters = PDFProcessor.extract_chapters_from_pdf(pdf_path)
-                
-                chunked_chapters = {}
-                for chapter_name, content in chapters.items():
-                    chunked_content = PDFProcessor.chunk_content(content)
-                    chunked_chapters[chapter_name] = chunked_content
-                
-                all_chapters[filename] = chunked_chapters
+        for pdf_path in PDFProcessor.list_pdfs(data_folder):
+            all_chapters[os.path.basename(pdf_path)] = PDFProcessor.process_pdf(pdf_path)
                 
         return all_chapters
\ No newline at end of file
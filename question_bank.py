@@ -0,0 +1,257 @@
+# question_bank.py
+import itertools
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import Config
+from fingerprint import chunk_hash, normalize_text
+from question_dedup import normalize_rows, question_key
+
+_WORD = re.compile(r'\w{4,}')
+
+def focus_tags(weaknesses: Iterable[str] = None) -> List[str]:
+    """Normalized weakness tags a question was generated for"""
+    return sorted({normalize_text(w).lower() for w in weaknesses or [] if w.strip()})
+
+def source_chunk_hashes(questions: List[Dict], chunks: List[str]) -> List[str]:
+    """
+    Attribute each question to the chunk it most likely came from (largest
+    word overlap) and return those chunks' fingerprints
+    """
+    if not chunks:
+        return [None] * len(questions)
+    chunk_words = [set(_WORD.findall(chunk.lower())) for chunk in chunks]
+    hashes = [chunk_hash(chunk) for chunk in chunks]
+    result = []
+    for question in questions:
+        words = set(_WORD.findall(" ".join(str(v) for v in question.values()).lower()))
+        best = max(range(len(chunks)), key=lambda i: len(words & chunk_words[i]))
+        result.append(hashes[best])
+    return result
+
+class QuestionBank:
+    """
+    Every generated question, keyed by book, chapter and type, with the
+    fingerprint of its source chunk, the weaknesses it targeted, a full-text
+    index and its embedding. Requests are served from here first: only
+    questions whose source chunk is still part of the chapter (fresh) and
+    that were not served to the learner before are handed out.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or Config.QUESTION_BANK_PATH
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                book TEXT NOT NULL,
+                chapter TEXT NOT NULL,
+                question_type TEXT NOT NULL,
+                chunk_hash TEXT,
+                question_key TEXT NOT NULL,
+                focus TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                embedding BLOB,
+                created_at REAL NOT NULL,
+                UNIQUE (book, chapter, question_type, question_key)
+            );
+            CREATE INDEX IF NOT EXISTS questions_by_chunk ON questions (book, chapter, chunk_hash);
+            CREATE TABLE IF NOT EXISTS served (
+                learner TEXT NOT NULL,
+                question_id INTEGER NOT NULL,
+                served_at REAL NOT NULL,
+                PRIMARY KEY (learner, question_id)
+            );
+        """)
+        try:
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(question, focus)")
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            self.logger.warning(f"SQLite FTS5 unavailable, focused lookups scan the whole chapter: {str(e)}")
+            self.fts = False
+        self.conn.commit()
+
+    def add_questions(self, book_title: str, chapter_name: str, question_type: str, questions: List[Dict],
+                      chunk_hashes: List[str], weaknesses: List[str] = None,
+                      embeddings: Optional[np.ndarray] = None) -> List[int]:
+        """Record generated questions and return their ids (existing ids for questions already banked)"""
+        focus = json.dumps(focus_tags(weaknesses))
+        if embeddings is not None:
+            embeddings = normalize_rows(embeddings)
+        now = time.time()
+        ids = []
+        with self._lock:
+            for i, (question, source) in enumerate(zip(questions, chunk_hashes)):
+                key = question_key(question)
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO questions (book, chapter, question_type, chunk_hash, question_key, "
+                    "focus, payload, embedding, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (book_title, chapter_name, question_type, source, key, focus,
+                     json.dumps(question, ensure_ascii=False),
+                     embeddings[i].tobytes() if embeddings is not None else None, now)
+                )
+                if cursor.rowcount:
+                    ids.append(cursor.lastrowid)
+                    if self.fts:
+                        self.conn.execute(
+                            "INSERT INTO questions_fts (rowid, question, focus) VALUES (?, ?, ?)",
+                            (cursor.lastrowid, question.get('question', ''), " ".join(json.loads(focus)))
+                        )
+                else:
+                    ids.append(self.conn.execute(
+                        "SELECT id FROM questions WHERE book = ? AND chapter = ? AND question_type = ? "
+                        "AND question_key = ?",
+                        (book_title, chapter_name, question_type, key)
+                    ).fetchone()[0])
+            self.conn.commit()
+        return ids
+
+    def find_fresh(self, book_title: str, chapter_name: str, question_type: str, num_questions: int,
+                   current_hashes: Iterable[str], learner: str = "", weaknesses: List[str] = None,
+                   weakness_vectors: np.ndarray = None,
+                   strength_vectors: np.ndarray = None) -> List[Tuple[int, Dict]]:
+        """
+        Up to num_questions (id, question) pairs that are fresh and not yet
+        served to learner. With weaknesses, only questions tagged with one of
+        them, whose embedding is relevant enough to them or whose text shares
+        a word with them (full-text match) qualify, best first.
+        Otherwise picks take turns across source chunks, in chapter order.
+        """
+        tags = set(focus_tags(weaknesses))
+        query = (
+            "SELECT id, chunk_hash, focus, payload, embedding FROM questions q "
+            "WHERE book = ? AND chapter = ? AND question_type = ? "
+            "AND NOT EXISTS (SELECT 1 FROM served s WHERE s.learner = ? AND s.question_id = q.id)"
+        )
+        params = [book_title, chapter_name, question_type, learner]
+        terms = self._match_terms(weaknesses)
+
+        with self._lock:
+            rows = self.conn.execute(query + " ORDER BY id", params).fetchall()
+            # Full-text hits widen and rank the candidates; they never exclude any
+            matched = set()
+            if tags and self.fts and terms:
+                matched = {row[0] for row in self.conn.execute(
+                    "SELECT f.rowid FROM questions_fts f JOIN questions q ON q.id = f.rowid "
+                    "WHERE questions_fts MATCH ? AND q.book = ? AND q.chapter = ?",
+                    (terms, book_title, chapter_name)
+                )}
+        position = {fingerprint: i for i, fingerprint in enumerate(current_hashes)}
+        rows = [row for row in rows if row[1] in position]
+
+        if tags:
+            ranked = []
+            for question_id, _, focus, payload, embedding in rows:
+                overlap = len(tags & set(json.loads(focus)))
+                score = self._relevance(embedding, weakness_vectors, strength_vectors)
+                hit = question_id in matched
+                if overlap or hit or score >= Config.QUESTION_BANK_MIN_RELEVANCE:
+                    ranked.append((-overlap, -score, not hit, question_id, payload))
+            ranked.sort()
+            chosen = [(question_id, payload) for *_, question_id, payload in ranked[:num_questions]]
+        else:
+            # General questions first, then ones generated for some weakness; within
+            # each, one question per chunk in turn so a request covers the whole chapter
+            chosen = []
+            for general in (True, False):
+                by_chunk: Dict[str, List[Tuple[int, str]]] = {}
+                for question_id, fingerprint, focus, payload, _ in rows:
+                    if (focus == "[]") == general:
+                        by_chunk.setdefault(fingerprint, []).append((question_id, payload))
+                turns = itertools.zip_longest(*(by_chunk[h] for h in sorted(by_chunk, key=position.get)))
+                chosen += [pick for turn in turns for pick in turn if pick is not None]
+            chosen = chosen[:num_questions]
+        return [(question_id, json.loads(payload)) for question_id, payload in chosen]
+
+    def chunk_questions(self, book_title: str, chapter_name: str, question_type: str,
+                        chunk_hash: str) -> List[Dict]:
+        """Every banked question generated from one chunk"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT payload FROM questions WHERE book = ? AND chapter = ? AND question_type = ? "
+                "AND chunk_hash = ? ORDER BY id",
+                (book_title, chapter_name, question_type, chunk_hash)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def served_questions(self, book_title: str, chapter_name: str, question_type: str,
+                         learner: str = "") -> List[Dict]:
+        """Questions of a chapter already handed to learner"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT payload FROM questions q JOIN served s ON s.question_id = q.id "
+                "WHERE s.learner = ? AND book = ? AND chapter = ? AND question_type = ? ORDER BY s.served_at",
+                (learner, book_title, chapter_name, question_type)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count_by_chunk(self, book_title: str, chapter_name: str, question_type: str,
+                       learner: str = "") -> Dict[str, int]:
+        """
+        Number of general (not weakness-targeted) questions per source chunk
+        that are still available to learner, i.e. not yet served to them
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT chunk_hash, COUNT(*) FROM questions q WHERE book = ? AND chapter = ? "
+                "AND question_type = ? AND focus = '[]' "
+                "AND NOT EXISTS (SELECT 1 FROM served s WHERE s.learner = ? AND s.question_id = q.id) "
+                "GROUP BY chunk_hash",
+                (book_title, chapter_name, question_type, learner)
+            ).fetchall()
+        return dict(rows)
+
+    def mark_served(self, learner: str, question_ids: List[int]):
+        """Record questions as handed to learner so they are not repeated"""
+        if not question_ids:
+            return
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO served (learner, question_id, served_at) VALUES (?, ?, ?)",
+                [(learner, question_id, now) for question_id in question_ids]
+            )
+            self.conn.commit()
+
+    def prune_stale(self, book_title: str, chapter_name: str, current_hashes: Iterable[str]) -> int:
+        """Delete a chapter's questions whose source chunk is no longer part of it"""
+        current = set(current_hashes)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, chunk_hash FROM questions WHERE book = ? AND chapter = ?",
+                (book_title, chapter_name)
+            ).fetchall()
+            stale = [(row[0],) for row in rows if row[1] not in current]
+            self.conn.executemany("DELETE FROM questions WHERE id = ?", stale)
+            self.conn.executemany("DELETE FROM served WHERE question_id = ?", stale)
+            if self.fts:
+                self.conn.executemany("DELETE FROM questions_fts WHERE rowid = ?", stale)
+            self.conn.commit()
+        return len(stale)
+
+    @staticmethod
+    def _match_terms(weaknesses: List[str] = None) -> str:
+        """FTS5 query matching any significant word of the weaknesses"""
+        words = sorted({word for w in weaknesses or [] for word in _WORD.findall(w.lower())})
+        return " OR ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+    @staticmethod
+    def _relevance(embedding: Optional[bytes], weakness_vectors: np.ndarray = None,
+                   strength_vectors: np.ndarray = None) -> float:
+        if embedding is None or weakness_vectors is None or not len(weakness_vectors):
+            return float("-inf")
+        vector = np.frombuffer(embedding, dtype=np.float32)
+        if vector.shape[0] != weakness_vectors.shape[1]:
+            return float("-inf")
+        score = float((weakness_vectors @ vector).max())
+        if strength_vectors is not None and len(strength_vectors):
+            score -= Config.RETRIEVAL_STRENGTH_PENALTY * float((strength_vectors @ vector).max())
+        return score
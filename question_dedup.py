@@ -0,0 +1,84 @@
+# question_dedup.py
+import logging
+import numpy as np
+from typing import Callable, Dict, List, Optional
+from config import Config
+
+def question_key(question: Dict) -> str:
+    """Exact-match key of a question's text"""
+    return question['question'].lower().strip()
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so dot products are cosine similarities"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+class QuestionDeduplicator:
+    """
+    Incremental duplicate filter over generated questions. Exact repeats are
+    always dropped; with an embed function, so is any question whose cosine
+    similarity to an already accepted one reaches the threshold. Each add()
+    embeds only the new candidates, in one batch.
+    """
+
+    def __init__(self, embed: Optional[Callable[[List[str]], np.ndarray]] = None, threshold: float = None):
+        self.logger = logging.getLogger(__name__)
+        self.embed = embed
+        self.threshold = Config.DEDUP_SIMILARITY_THRESHOLD if threshold is None else threshold
+        self.questions: List[Dict] = []
+        self.stats = {"exact_duplicates": 0, "near_duplicates": 0}
+        self._keys = set()
+        self._vectors: Optional[np.ndarray] = None
+
+    def add(self, candidates: List[Dict]) -> List[Dict]:
+        """Accept the candidates that duplicate nothing accepted so far, in order, and return them"""
+        fresh = []
+        for question in candidates:
+            key = question_key(question)
+            if key in self._keys:
+                self.stats["exact_duplicates"] += 1
+                continue
+            self._keys.add(key)
+            fresh.append(question)
+        if not fresh:
+            return []
+
+        keep = np.ones(len(fresh), dtype=bool)
+        vectors = self._embed([question['question'] for question in fresh])
+        if vectors is not None:
+            if self._vectors is not None and len(self._vectors):
+                keep &= (vectors @ self._vectors.T).max(axis=1) < self.threshold
+            # Greedy within the batch: earlier accepted candidates suppress later near copies
+            within = vectors @ vectors.T
+            for i in range(len(fresh)):
+                if keep[i]:
+                    keep[i + 1:] &= within[i, i + 1:] < self.threshold
+            kept = vectors[keep]
+            self._vectors = kept if self._vectors is None else np.vstack([self._vectors, kept])
+
+        dropped = int(len(fresh) - keep.sum())
+        if dropped:
+            self.stats["near_duplicates"] += dropped
+            self.logger.info(f"Dropped {dropped} near-duplicate questions")
+        accepted = [question for question, k in zip(fresh, keep) if k]
+        self.questions.extend(accepted)
+        return accepted
+
+    def exclude(self, questions: List[Dict]):
+        """Reject later candidates that repeat these questions, without accepting them"""
+        accepted, stats = len(self.questions), dict(self.stats)
+        self.add(questions)
+        del self.questions[accepted:]
+        self.stats = stats
+
+    def _embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        if self.embed is None:
+            return None
+        try:
+            return normalize_rows(self.embed(texts))
+        except Exception as e:
+            # Deduplication must never fail a generation request; exact matching still applies
+            self.logger.warning(f"Question embedding failed, falling back to exact deduplication: {str(e)}")
+            self.embed = None
+            return None
@@ -1,115 +1,601 @@
 from openai import OpenAI
-from typing import List, Dict, Tuple
+from typing import AsyncIterator, Callable, List, Dict, Iterator, Tuple
 from config import Config
 import re
 import logging
 import math
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import queue
+import threading
+import time
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from diskcache import Cache
+from embeddings_manager import EmbeddingsManager
+from fingerprint import stable_hash
+from llm_gateway import get_gateway
+from llm_scheduler import get_scheduler
+from question_dedup import QuestionDeduplicator
+from token_counter import get_token_counter
+from telemetry import telemetry
+
+_CHUNK_DONE = object()
+
+class _IncrementalQuestionParser:
+    """
+    Runs streamed completion text through a block parser one question at a
+    time: a question is complete once the next 'Q:' line, or the end of the
+    stream, arrives. Text before the first 'Q:' line is ignored.
+    """
+
+    def __init__(self, parse: Callable[[str], List[Dict]]):
+        self.parse = parse
+        self._partial_line = ''
+        self._block: List[str] = []
+
+    def feed(self, text: str) -> List[Dict]:
+        *lines, self._partial_line = (self._partial_line + text).split('\n')
+        completed = []
+        for line in lines:
+            if line.strip().lower().startswith('q:'):
+                completed.extend(self._flush())
+                self._block.append(line)
+            elif self._block:
+                self._block.append(line)
+        return completed
+
+    def close(self) -> List[Dict]:
+        self.feed('\n')
+        return self._flush()
+
+    def _flush(self) -> List[Dict]:
+        block, self._block = self._block, []
+        return self.parse('\n'.join(block)) if block else []
 
 class QuestionGenerator:
     def __init__(self):
         self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
+            base_url=Config.OPENROUTER_BASE_URL,
             api_key=Config.OPENROUTER_API_KEY,
+            max_retries=0  # retries are handled by the shared LLM scheduler
         )
         self.logger = logging.getLogger(__name__)
         self.cache = Cache(Config.CACHE_DIR)
+        self.token_counter = get_token_counter()
+        self.last_run_stats = {}
         
     def generate_questions(self, context: str, question_type: str, num_questions: int, 
-                         weaknesses: List[str] = None, strengths: List[str] = None) -> List[Dict]:
-        """Main method to generate questions with student weaknesses/strengths in mind"""
-        if not context:
-            raise ValueError("Empty context provided")
-            
-        if question_type not in ['mcq', 'written']:
-            raise ValueError("Invalid question type. Choose 'mcq' or 'written'")
-            
-        if num_questions <= 0:
-            raise ValueError("Number of questions must be positive")
+                         weaknesses: List[str] = None, strengths: List[str] = None,
+                         exclude: List[Dict] = None, use_cache: bool = True) -> List[Dict]:
+        """
+        Main method to generate questions with student weaknesses/strengths in mind.
+        Questions that duplicate one in exclude (e.g. already picked from the
+        question bank) are dropped before the result is cut to num_questions.
+        With use_cache=False chunk calls skip cached results (which may be the
+        very questions excluded) and ask the LLM again.
+        """
+        self._validate_request(context, question_type, num_questions)
 
         try:
-            token_count = len(context.split()) * 1.33
+            candidates = self._candidate_count(num_questions)
+            single_batch = self._fits_single_batch(context, question_type, candidates, weaknesses, strengths)
             
             if weaknesses or strengths:
-                if token_count <= Config.SINGLE_BATCH_THRESHOLD:
-                    return self._generate_single_batch_with_focus(context, question_type, num_questions, weaknesses, strengths)
+                if single_batch:
+                    questions = self._generate_single_batch_with_focus(context, question_type, candidates, weaknesses, strengths)
+                    return self._deduplicate_questions(questions, exclude)[:num_questions]
                 else:
-                    return self._generate_multi_batch_with_focus(context, question_type, num_questions, weaknesses, strengths)
+                    return self._generate_multi_batch_with_focus(context, question_type, num_questions,
+                                                                 weaknesses, strengths, exclude, use_cache)
             else:
-                if token_count <= Config.SINGLE_BATCH_THRESHOLD:
-                    return self._generate_single_batch(context, question_type, num_questions)
+                if single_batch:
+                    questions = self._generate_single_batch(context, question_type, candidates)
+                    return self._deduplicate_questions(questions, exclude)[:num_questions]
                 else:
-                    return self._generate_multi_batch(context, question_type, num_questions)
+                    return self._generate_multi_batch(context, question_type, num_questions, exclude, use_cache)
                 
         except Exception as e:
             self.logger.error(f"Question generation failed: {str(e)}")
             raise
 
+    async def agenerate_questions(self, context: str, question_type: str, num_questions: int,
+                                  weaknesses: List[str] = None, strengths: List[str] = None) -> List[Dict]:
+        """Async variant of generate_questions that issues chunk calls through the shared LLM gateway"""
+        self._validate_request(context, question_type, num_questions)
+
+        try:
+            candidates = self._candidate_count(num_questions)
+            if self._fits_single_batch(context, question_type, candidates, weaknesses, strengths):
+                prompt = self._build_prompt(context, question_type, candidates, weaknesses, strengths)
+                response = await get_gateway().complete(
+                    prompt, max_tokens=self._output_tokens(question_type, candidates),
+                    component="question_generator"
+                )
+                return self._deduplicate_questions(self._parse_response(question_type, response))[:num_questions]
+            
+            plan = self._plan_chunk_calls(context, candidates, question_type, weaknesses, strengths)
+            tasks = [
+                asyncio.create_task(self._agenerate_questions_from_chunk(
+                    chunk, question_type, chunk_questions, weaknesses, strengths
+                ))
+                for chunk, chunk_questions in plan
+            ]
+            
+            dedup = self.deduplicator()
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    dedup.add(await next_done)
+                    if len(dedup.questions) >= num_questions:
+                        break
+            finally:
+                skipped = [call for call, task in zip(plan, tasks) if not task.done()]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                self._record_skipped_calls(skipped, question_type, weaknesses, strengths)
+            
+            return dedup.questions[:num_questions]
+                
+        except Exception as e:
+            self.logger.error(f"Question generation failed: {str(e)}")
+            raise
+
+    def stream_questions(self, context: str, question_type: str, num_questions: int,
+                         weaknesses: List[str] = None, strengths: List[str] = None) -> Iterator[Dict]:
+        """
+        Yield questions as soon as each is parsed from the streamed completions,
+        deduplicated on the fly. Stops once num_questions unique questions have
+        been yielded and abandons the chunk calls still running.
+
+        Questions that are already waiting (e.g. a whole cached chunk) are
+        deduplicated together in one embedding call; a question that arrives
+        alone is embedded alone rather than held back for a batch, trading
+        embedding calls for time to first question.
+        """
+        self._validate_request(context, question_type, num_questions)
+        plan = self._stream_plan(context, question_type, num_questions, weaknesses, strengths)
+        
+        results = queue.Queue()
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=Config.MAX_WORKERS)
+        for chunk, chunk_questions in plan:
+            executor.submit(self._stream_chunk, chunk, question_type, chunk_questions,
+                            weaknesses, strengths, results, stop)
+        
+        dedup = self.deduplicator()
+        finished = 0
+        try:
+            while finished < len(plan) and len(dedup.questions) < num_questions:
+                items = [results.get()]
+                while not results.empty():
+                    items.append(results.get_nowait())
+                finished += sum(item is _CHUNK_DONE for item in items)
+                wanted = num_questions - len(dedup.questions)
+                yield from dedup.add([item for item in items if item is not _CHUNK_DONE])[:wanted]
+        finally:
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            if finished < len(plan):
+                self.logger.info(f"Stopped streaming with {len(plan) - finished} chunk calls unfinished")
+
+    async def astream_questions(self, context: str, question_type: str, num_questions: int,
+                                weaknesses: List[str] = None, strengths: List[str] = None) -> AsyncIterator[Dict]:
+        """Async variant of stream_questions; outstanding chunk calls are cancelled once enough questions arrive"""
+        self._validate_request(context, question_type, num_questions)
+        plan = self._stream_plan(context, question_type, num_questions, weaknesses, strengths)
+        
+        results = asyncio.Queue()
+        tasks = [
+            asyncio.create_task(self._astream_chunk(chunk, question_type, chunk_questions,
+                                                    weaknesses, strengths, results))
+            for chunk, chunk_questions in plan
+        ]
+        
+        dedup = self.deduplicator()
+        finished = 0
+        try:
+            while finished < len(tasks) and len(dedup.questions) < num_questions:
+                # Whatever is already queued is deduplicated in one batch, as in stream_questions
+                items = [await results.get()]
+                while not results.empty():
+                    items.append(results.get_nowait())
+                finished += sum(item is _CHUNK_DONE for item in items)
+                wanted = num_questions - len(dedup.questions)
+                for item in dedup.add([item for item in items if item is not _CHUNK_DONE])[:wanted]:
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if finished < len(tasks):
+                self.logger.info(f"Stopped streaming with {len(tasks) - finished} chunk calls cancelled")
+
+    def _stream_plan(self, context: str, question_type: str, num_questions: int,
+                     weaknesses: List[str] = None, strengths: List[str] = None) -> List[Tuple[str, int]]:
+        candidates = self._candidate_count(num_questions)
+        if self._fits_single_batch(context, question_type, candidates, weaknesses, strengths):
+            return [(context, candidates)]
+        return self._plan_chunk_calls(context, candidates, question_type, weaknesses, strengths)
+
+    def _stream_chunk(self, chunk: str, question_type: str, num_questions: int,
+                      weaknesses: List[str], strengths: List[str], results: queue.Queue, stop: threading.Event):
+        """Put each question of a chunk on the results queue as it is parsed, then _CHUNK_DONE"""
+        cache_key = self._cache_key(chunk, question_type, num_questions, weaknesses, strengths,
+                                    focused=bool(weaknesses or strengths))
+        try:
+            cached = self._cached_questions(cache_key)
+            if cached is not None:
+                for question in cached:
+                    results.put(question)
+                return
+            
+            prompt = self._build_prompt(chunk, question_type, num_questions, weaknesses, strengths)
+            parser = _IncrementalQuestionParser(lambda text: self._parse_response(question_type, text))
+            questions = []
+            with closing(self._stream_llm(prompt, self._output_tokens(question_type, num_questions))) as fragments:
+                for fragment in fragments:
+                    if stop.is_set():
+                        return
+                    for question in parser.feed(fragment):
+                        questions.append(question)
+                        results.put(question)
+            for question in parser.close():
+                questions.append(question)
+                results.put(question)
+            self.cache[cache_key] = questions
+        except Exception as e:
+            self.logger.error(f"Failed to stream chunk: {str(e)}")
+        finally:
+            results.put(_CHUNK_DONE)
+
+    async def _astream_chunk(self, chunk: str, question_type: str, num_questions: int,
+                             weaknesses: List[str], strengths: List[str], results: asyncio.Queue):
+        cache_key = self._cache_key(chunk, question_type, num_questions, weaknesses, strengths,
+                                    focused=bool(weaknesses or strengths))
+        try:
+            cached = self._cached_questions(cache_key)
+            if cached is not None:
+                for question in cached:
+                    results.put_nowait(question)
+                return
+            
+            prompt = self._build_prompt(chunk, question_type, num_questions, weaknesses, strengths)
+            parser = _IncrementalQuestionParser(lambda text: self._parse_response(question_type, text))
+            questions = []
+            fragments = get_gateway().stream(
+                prompt, max_tokens=self._output_tokens(question_type, num_questions), component="question_generator"
+            )
+            try:
+                async for fragment in fragments:
+                    for question in parser.feed(fragment):
+                        questions.append(question)
+                        results.put_nowait(question)
+            finally:
+                await fragments.aclose()
+            for question in parser.close():
+                questions.append(question)
+                results.put_nowait(question)
+            self.cache[cache_key] = questions
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Failed to stream chunk: {str(e)}")
+        finally:
+            results.put_nowait(_CHUNK_DONE)
+
+    async def _agenerate_questions_from_chunk(self, chunk: str, question_type: str, num_questions: int,
+                                              weaknesses: List[str] = None, strengths: List[str] = None) -> List[Dict]:
+        """Async counterpart of _generate_questions_from_chunk(_with_focus), sharing the same cache"""
+        focused = bool(weaknesses or strengths)
+        cache_key = self._cache_key(chunk, question_type, num_questions, weaknesses, strengths, focused=focused)
+        
+        cached = self._cached_questions(cache_key)
+        if cached is not None:
+            return cached
+            
+        try:
+            prompt = self._build_prompt(chunk, question_type, num_questions, weaknesses, strengths)
+            response = await get_gateway().complete(
+                prompt, max_tokens=self._output_tokens(question_type, num_questions),
+                component="question_generator"
+            )
+            result = self._parse_response(question_type, response)
+            self.cache[cache_key] = result
+            return result
+        except Exception as e:
+            self.logger.error(f"Failed to process chunk: {str(e)}")
+            return []
+
+    @staticmethod
+    def _validate_request(context: str, question_type: str, num_questions: int):
+        if not context:
+            raise ValueError("Empty context provided")
+            
+        if question_type not in ['mcq', 'written']:
+            raise ValueError("Invalid question type. Choose 'mcq' or 'written'")
+            
+        if num_questions <= 0:
+            raise ValueError("Number of questions must be positive")
+
+    @staticmethod
+    def _build_prompt(context: str, question_type: str, num_questions: int,
+                      weaknesses: List[str] = None, strengths: List[str] = None) -> str:
+        """Fill the plain or weakness-focused template for the question type"""
+        if weaknesses or strengths:
+            template = Config.MCQ_WEAKNESS_TEMPLATE if question_type == 'mcq' else Config.WRITTEN_WEAKNESS_TEMPLATE
+            return template.format(
+                num_questions=num_questions,
+                weaknesses=", ".join(weaknesses) if weaknesses else "none",
+                strengths=", ".join(strengths) if strengths else "none",
+                context=context
+            )
+        template = Config.MCQ_TEMPLATE if question_type == 'mcq' else Config.WRITTEN_TEMPLATE
+        return template.format(num_questions=num_questions, context=context)
+
+    def _parse_response(self, question_type: str, response: str) -> List[Dict]:
+        with telemetry.span("qgen.parse", question_type=question_type):
+            if question_type == 'mcq':
+                return self._parse_mcq_response(response)
+            return self._parse_written_response(response)
+
+    def _cached_questions(self, cache_key: str):
+        """Cached questions for a chunk call, or None; every lookup counts towards the hit ratio"""
+        questions = self.cache.get(cache_key)
+        telemetry.record_cache("question_chunks", hit=questions is not None)
+        return questions
+
     def _generate_single_batch(self, context: str, question_type: str, num_questions: int) -> List[Dict]:
         """Handle small content in one batch"""
         if question_type == 'mcq':
             return self._generate_mcqs(context, num_questions)
         return self._generate_written(context, num_questions)
 
-    def _generate_multi_batch(self, context: str, question_type: str, num_questions: int) -> List[Dict]:
+    def _generate_multi_batch(self, context: str, question_type: str, num_questions: int,
+                              exclude: List[Dict] = None, use_cache: bool = True) -> List[Dict]:
         """Handle large content with chunking and parallel processing"""
-        chunks, questions_per_chunk = self._calculate_optimal_chunking(context, num_questions)
+        plan = self._plan_chunk_calls(context, self._candidate_count(num_questions), question_type)
+        return self._run_chunk_calls(
+            plan, question_type, num_questions,
+            lambda chunk, chunk_questions: self._generate_questions_from_chunk(
+                chunk, question_type, chunk_questions, use_cache
+            ),
+            exclude=exclude
+        )
+
+    def _run_chunk_calls(self, plan: List[Tuple[str, int]], question_type: str, num_questions: int,
+                         generate: Callable[[str, int], List[Dict]],
+                         weaknesses: List[str] = None, strengths: List[str] = None,
+                         exclude: List[Dict] = None) -> List[Dict]:
+        """
+        Run the planned chunk calls, collecting results in completion order, and
+        stop as soon as num_questions unique questions are in. Calls that have
+        not started by then are cancelled.
+        """
+        executor = ThreadPoolExecutor(max_workers=Config.MAX_WORKERS)
+        futures = {executor.submit(generate, chunk, chunk_questions): (chunk, chunk_questions)
+                   for chunk, chunk_questions in plan}
         
-        with ThreadPoolExecutor(max_workers=Config.MAX_WORKERS) as executor:
-            futures = []
-            for chunk in chunks:
-                futures.append(
-                    executor.submit(
-                        self._generate_questions_from_chunk,
-                        chunk,
-                        question_type,
-                        questions_per_chunk
-                    )
-                )
-            
-            questions = []
-            for future in futures:
+        dedup = self.deduplicator(exclude)
+        try:
+            for future in as_completed(futures):
                 try:
-                    questions.extend(future.result())
+                    dedup.add(future.result())
                 except Exception as e:
                     self.logger.warning(f"Chunk processing failed: {str(e)}")
+                if len(dedup.questions) >= num_questions:
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        skipped = [call for future, call in futures.items() if future.cancelled()]
+        self._record_skipped_calls(skipped, question_type, weaknesses, strengths)
+        return dedup.questions[:num_questions]
+
+    def _record_skipped_calls(self, skipped: List[Tuple[str, int]], question_type: str,
+                              weaknesses: List[str] = None, strengths: List[str] = None):
+        """Count the LLM calls and tokens an early stop saved (cached chunks cost nothing either way)"""
+        focused = bool(weaknesses or strengths)
+        saved = [
+            (chunk, chunk_questions) for chunk, chunk_questions in skipped
+            if self._cache_key(chunk, question_type, chunk_questions, weaknesses, strengths, focused=focused)
+            not in self.cache
+        ]
+        saved_tokens = sum(
+            self.estimate_call_tokens(chunk, question_type, chunk_questions, weaknesses, strengths)
+            for chunk, chunk_questions in saved
+        )
+        self.last_run_stats.update({
+            "saved_calls": len(saved),
+            "saved_tokens": saved_tokens,
+            "used_calls": max(0, self.last_run_stats.get("used_calls", 0) - len(saved))
+        })
+        if saved:
+            self.logger.info(f"Stopped early: skipped {len(saved)} chunk calls, about {saved_tokens} tokens")
+
+    def estimate_call_tokens(self, context: str, question_type: str, num_questions: int,
+                             weaknesses: List[str] = None, strengths: List[str] = None) -> int:
+        """Prompt tokens plus the completion budget of one call generating from context"""
+        prompt = self._build_prompt(context, question_type, num_questions, weaknesses, strengths)
+        return self.token_counter.count(prompt) + self._output_tokens(question_type, num_questions)
+
+    def _context_budget(self, question_type: str, num_questions: int,
+                        weaknesses: List[str] = None, strengths: List[str] = None) -> int:
+        """Tokens left for excerpt text once the template and the completion are accounted for"""
+        template_tokens = self.token_counter.count(
+            self._build_prompt('', question_type, num_questions, weaknesses, strengths)
+        )
+        window = int(Config.MAX_CONTEXT_WINDOW * Config.SAFETY_MARGIN)
+        return max(1, window - template_tokens - self._output_tokens(question_type, num_questions))
+
+    def _fits_single_batch(self, context: str, question_type: str, num_questions: int,
+                           weaknesses: List[str] = None, strengths: List[str] = None) -> bool:
+        if num_questions > self._questions_per_call(question_type):
+            return False
+        budget = min(Config.SINGLE_BATCH_THRESHOLD,
+                     self._context_budget(question_type, num_questions, weaknesses, strengths))
+        return self.token_counter.count(context) <= budget
+
+    def _plan_chunk_calls(self, context: str, num_questions: int, question_type: str = 'mcq',
+                          weaknesses: List[str] = None, strengths: List[str] = None) -> List[Tuple[str, int]]:
+        """
+        Plan the LLM calls for a multi-batch request as (chunk, question count) pairs.
+        At most min(MAX_CHUNKS, num_questions) calls are made. When there are more
+        chunks than that, adjacent chunks are merged (up to what fits one prompt)
+        so the whole context is still covered; only context too long for that is
+        sampled evenly. Questions are shared out in proportion to chunk token mass
+        so the counts add up to exactly num_questions, and no call asks for more
+        than fits in its completion budget (_questions_per_call); a request too
+        big for MAX_CHUNKS such calls is spread over more of them.
+        """
+        with telemetry.span("qgen.chunking", question_type=question_type):
+            per_call = self._questions_per_call(question_type)
+            min_calls = math.ceil(num_questions / per_call)
+            budget = self._context_budget(question_type, num_questions, weaknesses, strengths)
+            chunks, sizes = self._split_into_chunks(context, min(Config.MAX_CHUNK_TOKENS, budget))
+            if len(chunks) < min_calls:
+                # Too few chunks to keep every call's completion under the cap
+                chunks, sizes = self._split_into_chunks(context, max(1, math.ceil(sum(sizes) / min_calls)))
             
-            return self._deduplicate_questions(questions)[:num_questions]
+            max_calls = min(len(chunks), max(Config.MAX_CHUNKS, min_calls), num_questions)
+            if len(chunks) > max_calls:
+                # Re-pack into bigger chunks, up to a full prompt each, and merge the leftovers
+                chunks, sizes = self._split_into_chunks(
+                    context, min(budget, max(Config.MAX_CHUNK_TOKENS, math.ceil(sum(sizes) / max_calls)))
+                )
+                chunks, sizes = self._merge_adjacent(chunks, sizes, max_calls, budget)
+                max_calls = min(len(chunks), max_calls)
+            picks = [i * len(chunks) // max_calls for i in range(max_calls)]
+            selected = [chunks[i] for i in picks]
+            allocation = self._allocate_questions([sizes[i] for i in picks], num_questions, per_call)
+            plan = [(chunk, n) for chunk, n in zip(selected, allocation) if n > 0]
+        
+        focused = bool(weaknesses or strengths)
+        cached = sum(
+            self._cache_key(chunk, question_type, n, weaknesses, strengths, focused=focused) in self.cache
+            for chunk, n in plan
+        )
+        self.last_run_stats = {
+            "available_chunks": len(chunks),
+            "planned_calls": len(plan),
+            "used_calls": len(plan) - cached,
+            "questions_requested": num_questions
+        }
+        self.logger.info(
+            f"Planned {len(plan)} chunk calls from {len(chunks)} chunks "
+            f"({len(plan) - cached} need the LLM, {cached} cached)"
+        )
+        return plan
 
-    def _calculate_optimal_chunking(self, context: str, num_questions: int) -> Tuple[List[str], int]:
-        """Determine optimal chunking strategy"""
-        paragraphs = [p for p in context.split('\n\n') if p.strip()]
-        total_paragraphs = len(paragraphs)
+    def _split_into_chunks(self, context: str, chunk_budget: int) -> Tuple[List[str], List[int]]:
+        """Greedily pack paragraphs into chunks of at most chunk_budget tokens"""
+        paragraphs = []
+        for para in (p for p in context.split('\n\n') if p.strip()):
+            paragraphs.extend(self._split_oversized(para, chunk_budget))
+        para_sizes = self.token_counter.count_many(paragraphs)
         
         chunks = []
+        chunk_sizes = []
         current_chunk = []
         current_size = 0
         
-        for para in paragraphs:
-            para_size = len(para.split())
-            if current_size + para_size > Config.MAX_CHUNK_TOKENS and current_chunk:
+        for para, para_size in zip(paragraphs, para_sizes):
+            if current_size + para_size > chunk_budget and current_chunk:
                 chunks.append("\n\n".join(current_chunk))
+                chunk_sizes.append(current_size)
                 current_chunk = []
                 current_size = 0
                 
             current_chunk.append(para)
-            current_size += para_size
+            current_size += int(para_size)
             
         if current_chunk:
             chunks.append("\n\n".join(current_chunk))
+            chunk_sizes.append(current_size)
             
-        num_chunks = min(len(chunks), Config.MAX_CHUNKS)
-        questions_per_chunk = max(1, math.ceil(num_questions / num_chunks))
-        
-        return chunks, questions_per_chunk
+        return chunks, chunk_sizes
+
+    @staticmethod
+    def _merge_adjacent(chunks: List[str], sizes: List[int], groups: int,
+                        budget: int) -> Tuple[List[str], List[int]]:
+        """
+        Merge runs of adjacent chunks into about `groups` chunks of similar token
+        mass, none larger than budget (so there can be more groups if the
+        context is too long to fit)
+        """
+        target = sum(sizes) / groups
+        merged, merged_sizes = [], []
+        current, current_size = [], 0
+        for chunk, size in zip(chunks, sizes):
+            # Close the group once this chunk would mostly land past the target
+            full = current_size + size > budget or (current_size + size / 2 > target
+                                                    and len(merged) < groups - 1)
+            if current and full:
+                merged.append("\n\n".join(current))
+                merged_sizes.append(current_size)
+                current, current_size = [], 0
+            current.append(chunk)
+            current_size += size
+        if current:
+            merged.append("\n\n".join(current))
+            merged_sizes.append(current_size)
+        return merged, merged_sizes
+
+    @staticmethod
+    def _allocate_questions(sizes: List[int], num_questions: int, per_call: int = None) -> List[int]:
+        """
+        Largest-remainder split of num_questions across chunks by token mass,
+        giving every chunk at least one question when there are enough to go round.
+        No chunk gets more than per_call; its excess goes to the chunks with most room.
+        """
+        if not sizes:
+            return []
+        floor_each = 1 if num_questions >= len(sizes) else 0
+        remaining = num_questions - floor_each * len(sizes)
+        total = sum(sizes) or len(sizes)
+        shares = [remaining * (size or 1) / total for size in sizes]
+        allocation = [floor_each + int(share) for share in shares]
+        leftover = num_questions - sum(allocation)
+        by_remainder = sorted(range(len(sizes)), key=lambda i: shares[i] - int(shares[i]), reverse=True)
+        for i in by_remainder[:leftover]:
+            allocation[i] += 1
+        if per_call:
+            excess = sum(max(0, n - per_call) for n in allocation)
+            allocation = [min(n, per_call) for n in allocation]
+            while excess and min(allocation) < per_call:
+                allocation[allocation.index(min(allocation))] += 1
+                excess -= 1
+        return allocation
+
+    @staticmethod
+    def _questions_per_call(question_type: str) -> int:
+        """Most questions one call can return within LLM_MAX_OUTPUT_TOKENS after the reasoning"""
+        room = Config.LLM_MAX_OUTPUT_TOKENS - Config.LLM_REASONING_TOKENS
+        return max(1, room // Config.OUTPUT_TOKENS_PER_QUESTION[question_type])
+
+    @staticmethod
+    def _output_tokens(question_type: str, num_questions: int) -> int:
+        """Completion budget for a call asking for num_questions questions"""
+        per_question = Config.OUTPUT_TOKENS_PER_QUESTION[question_type]
+        return min(Config.LLM_MAX_OUTPUT_TOKENS, Config.LLM_REASONING_TOKENS + per_question * num_questions)
 
-    def _generate_questions_from_chunk(self, chunk: str, question_type: str, num_questions: int) -> List[Dict]:
+    def _split_oversized(self, paragraph: str, max_tokens: int) -> List[str]:
+        """Split a paragraph that alone exceeds the token budget into word-aligned pieces"""
+        tokens = self.token_counter.count(paragraph)
+        if tokens <= max_tokens:
+            return [paragraph]
+        words = paragraph.split()
+        pieces = math.ceil(tokens / max_tokens)
+        words_per_piece = math.ceil(len(words) / pieces)
+        return [' '.join(words[i:i + words_per_piece]) for i in range(0, len(words), words_per_piece)]
+
+    def _generate_questions_from_chunk(self, chunk: str, question_type: str, num_questions: int,
+                                       use_cache: bool = True) -> List[Dict]:
         """Generate questions from a single chunk"""
-        cache_key = f"{hash(chunk)}_{question_type}_{num_questions}"
+        cache_key = self._cache_key(chunk, question_type, num_questions)
         
-        if cache_key in self.cache:
-            return self.cache[cache_key]
+        cached = self._cached_questions(cache_key) if use_cache else None
+        if cached is not None:
+            return cached
             
         try:
             if question_type == 'mcq':
@@ -123,33 +609,79 @@ class QuestionGenerator:
             self.logger.error(f"Failed to process chunk: {str(e)}")
             return []
 
-    def _generate_mcqs(self, context: str, num_questions: int) -> List[Dict]:
-        prompt = Config.MCQ_TEMPLATE.format(
-            num_questions=num_questions,
-            context=context
+    @staticmethod
+    def _cache_key(chunk: str, question_type: str, num_questions: int,
+                   weaknesses: List[str] = None, strengths: List[str] = None,
+                   focused: bool = False) -> str:
+        """Process-independent cache key covering the chunk, model, prompt template and request"""
+        if focused:
+            template = Config.MCQ_WEAKNESS_TEMPLATE if question_type == 'mcq' else Config.WRITTEN_WEAKNESS_TEMPLATE
+        else:
+            template = Config.MCQ_TEMPLATE if question_type == 'mcq' else Config.WRITTEN_TEMPLATE
+        return stable_hash(
+            chunk, Config.LLM_MODEL, template, question_type, num_questions,
+            "|".join(weaknesses or []), "|".join(strengths or [])
         )
-        response = self._call_llm(prompt)
-        return self._parse_mcq_response(response)
+
+    def _generate_mcqs(self, context: str, num_questions: int) -> List[Dict]:
+        prompt = self._build_prompt(context, 'mcq', num_questions)
+        response = self._call_llm(prompt, self._output_tokens('mcq', num_questions))
+        return self._parse_response('mcq', response)
 
     def _generate_written(self, context: str, num_questions: int) -> List[Dict]:
-        prompt = Config.WRITTEN_TEMPLATE.format(
-            num_questions=num_questions,
-            context=context
-        )
-        response = self._call_llm(prompt)
-        return self._parse_written_response(response)
+        prompt = self._build_prompt(context, 'written', num_questions)
+        response = self._call_llm(prompt, self._output_tokens('written', num_questions))
+        return self._parse_response('written', response)
 
-    def _call_llm(self, prompt: str) -> str:
+    def _stream_llm(self, prompt: str, max_tokens: int = None) -> Iterator[str]:
+        """Yield completion text as it arrives; closing the generator early closes the HTTP stream"""
+        max_tokens = max_tokens or Config.LLM_MAX_OUTPUT_TOKENS
         try:
-            completion = self.client.chat.completions.create(
-                extra_headers={
-                    "HTTP-Referer": Config.SITE_URL,
-                    "X-Title": Config.SITE_NAME,
-                },
-                model=Config.LLM_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=2000
+            stream = get_scheduler().run(
+                lambda: self.client.chat.completions.create(
+                    extra_headers={
+                        "HTTP-Referer": Config.SITE_URL,
+                        "X-Title": Config.SITE_NAME,
+                    },
+                    model=Config.LLM_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.7,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                ),
+                prompt, max_tokens, 0.7, coalesce=False, component="question_generator"
+            )
+        except Exception as e:
+            self.logger.error(f"LLM API call failed: {str(e)}")
+            raise
+        # llm.call only covers opening the stream; llm.stream times the body up to the final chunk
+        start = time.perf_counter()
+        try:
+            for event in stream:
+                if event.usage:
+                    telemetry.record_usage("question_generator", event.usage)
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+        finally:
+            stream.close()
+            telemetry.record_span("llm.stream", time.perf_counter() - start, component="question_generator")
+
+    def _call_llm(self, prompt: str, max_tokens: int = None) -> str:
+        max_tokens = max_tokens or Config.LLM_MAX_OUTPUT_TOKENS
+        try:
+            completion = get_scheduler().run(
+                lambda: self.client.chat.completions.create(
+                    extra_headers={
+                        "HTTP-Referer": Config.SITE_URL,
+                        "X-Title": Config.SITE_NAME,
+                    },
+                    model=Config.LLM_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.7,
+                    max_tokens=max_tokens
+                ),
+                prompt, max_tokens, 0.7, component="question_generator"
             )
             return completion.choices[0].message.content
         except Exception as e:
@@ -166,41 +698,28 @@ class QuestionGenerator:
 
     def _generate_multi_batch_with_focus(self, context: str, question_type: str, 
                                        num_questions: int, weaknesses: List[str], 
-                                       strengths: List[str]) -> List[Dict]:
+                                       strengths: List[str], exclude: List[Dict] = None,
+                                       use_cache: bool = True) -> List[Dict]:
         """Handle large content with chunking and parallel processing with focus"""
-        chunks, questions_per_chunk = self._calculate_optimal_chunking(context, num_questions)
-        
-        with ThreadPoolExecutor(max_workers=Config.MAX_WORKERS) as executor:
-            futures = []
-            for chunk in chunks:
-                futures.append(
-                    executor.submit(
-                        self._generate_questions_from_chunk_with_focus,
-                        chunk,
-                        question_type,
-                        questions_per_chunk,
-                        weaknesses,
-                        strengths
-                    )
-                )
-            
-            questions = []
-            for future in futures:
-                try:
-                    questions.extend(future.result())
-                except Exception as e:
-                    self.logger.warning(f"Chunk processing failed: {str(e)}")
-            
-            return self._deduplicate_questions(questions)[:num_questions]
+        plan = self._plan_chunk_calls(context, self._candidate_count(num_questions), question_type,
+                                      weaknesses, strengths)
+        return self._run_chunk_calls(
+            plan, question_type, num_questions,
+            lambda chunk, chunk_questions: self._generate_questions_from_chunk_with_focus(
+                chunk, question_type, chunk_questions, weaknesses, strengths, use_cache
+            ),
+            weaknesses, strengths, exclude
+        )
 
     def _generate_questions_from_chunk_with_focus(self, chunk: str, question_type: str, 
                                                 num_questions: int, weaknesses: List[str], 
-                                                strengths: List[str]) -> List[Dict]:
+                                                strengths: List[str], use_cache: bool = True) -> List[Dict]:
         """Generate questions from a single chunk with focus on weaknesses"""
-        cache_key = f"{hash(chunk)}_{question_type}_{num_questions}_w{hash(str(weaknesses))}_s{hash(str(strengths))}"
+        cache_key = self._cache_key(chunk, question_type, num_questions, weaknesses, strengths, focused=True)
         
-        if cache_key in self.cache:
-            return self.cache[cache_key]
+        cached = self._cached_questions(cache_key) if use_cache else None
+        if cached is not None:
+            return cached
             
         try:
             if question_type == 'mcq':
@@ -216,39 +735,44 @@ class QuestionGenerator:
 
     def _generate_mcqs_with_focus(self, context: str, num_questions: int, 
                                  weaknesses: List[str], strengths: List[str]) -> List[Dict]:
-        prompt = Config.MCQ_WEAKNESS_TEMPLATE.format(
-            num_questions=num_questions,
-            weaknesses=", ".join(weaknesses) if weaknesses else "none",
-            strengths=", ".join(strengths) if strengths else "none",
-            context=context
-        )
-        response = self._call_llm(prompt)
-        return self._parse_mcq_response(response)
+        prompt = self._build_prompt(context, 'mcq', num_questions, weaknesses, strengths)
+        response = self._call_llm(prompt, self._output_tokens('mcq', num_questions))
+        return self._parse_response('mcq', response)
 
     def _generate_written_with_focus(self, context: str, num_questions: int, 
                                    weaknesses: List[str], strengths: List[str]) -> List[Dict]:
-        prompt = Config.WRITTEN_WEAKNESS_TEMPLATE.format(
-            num_questions=num_questions,
-            weaknesses=", ".join(weaknesses) if weaknesses else "none",
-            strengths=", ".join(strengths) if strengths else "none",
-            context=context
-        )
-        response = self._call_llm(prompt)
-        return self._parse_written_response(response)
+        prompt = self._build_prompt(context, 'written', num_questions, weaknesses, strengths)
+        response = self._call_llm(prompt, self._output_tokens('written', num_questions))
+        return self._parse_response('written', response)
+
+    def _deduplicate_questions(self, questions: List[Dict], exclude: List[Dict] = None) -> List[Dict]:
+        """Remove exact and near-duplicate questions while preserving order"""
+        dedup = self.deduplicator(exclude)
+        dedup.add(questions)
+        return dedup.questions
+
+    def deduplicator(self, exclude: List[Dict] = None) -> QuestionDeduplicator:
+        """A duplicate filter configured like this generator's, rejecting repeats of exclude"""
+        dedup = QuestionDeduplicator(self.embed_questions if Config.SEMANTIC_DEDUP else None)
+        if exclude:
+            dedup.exclude(exclude)
+        return dedup
 
     @staticmethod
-    def _deduplicate_questions(questions: List[Dict]) -> List[Dict]:
-        """Remove duplicate questions while preserving order"""
-        seen = set()
-        unique_questions = []
-        
-        for q in questions:
-            question_text = q['question'].lower().strip()
-            if question_text not in seen:
-                seen.add(question_text)
-                unique_questions.append(q)
-                
-        return unique_questions
+    def embed_questions(texts: List[str]):
+        """Embed question texts in one batch with the shared embedding model"""
+        with telemetry.span("qgen.dedup_embedding"):
+            return EmbeddingsManager.shared().encode_chunks(texts)
+
+    @staticmethod
+    def _candidate_count(num_questions: int) -> int:
+        """
+        Questions to request so duplicates can be dropped without another LLM
+        round-trip. The surplus is also what lets multi-chunk generation stop
+        early: the plan asks for more than num_questions, so the last chunk
+        calls are only needed when earlier ones come back short.
+        """
+        return num_questions + math.ceil(num_questions * Config.DEDUP_SURPLUS_RATIO)
 
     @staticmethod
     def _parse_mcq_response(text: str) -> List[Dict]:
@@ -1,23 +1,57 @@
+import numpy as np
+from typing import List
 from embeddings_manager import EmbeddingsManager
+from chapter_store import ChapterStore
+from ttl_cache import chapter_cache, chapter_list_cache
+from config import Config
+
+_NUMBER_WORDS = {
+    word: value for value, word in enumerate(
+        "zero one two three four five six seven eight nine ten eleven twelve thirteen "
+        "fourteen fifteen sixteen seventeen eighteen nineteen twenty".split()
+    )
+}
+_NUMBER_WORDS.update({"thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90})
+
+def _chapter_order(chapter: str) -> tuple:
+    """Sort key putting "2" before "10" and "Two" before "Ten"; unknown labels go last"""
+    if chapter.isdigit():
+        return (int(chapter), chapter)
+    return (_NUMBER_WORDS.get(chapter.lower(), float("inf")), chapter)
 
 class ChapterRetriever:
-    def __init__(self):
-        self.embeddings_manager = EmbeddingsManager()
+    def __init__(self, embeddings_manager: EmbeddingsManager = None):
+        self.embeddings_manager = embeddings_manager or EmbeddingsManager.shared()
+        self.chapter_store = ChapterStore()
     
     def get_full_chapter(self, book_title: str, chapter_number: str) -> str:
         """
-        Retrieves chapter content with PROPER spacing matching your Pinecone data
+        Retrieves chapter content, reading the local chapter store first
         """
-        chapter_name = f"Chapter  {chapter_number.title()}"        
-        chunks = self.embeddings_manager.index.query(
-            vector=[0]*384,
-            top_k=10000,
-            filter={
-                "book": {"$eq": book_title},
-                "chapter": {"$eq": chapter_name}
-            },
-            include_metadata=True
-        )['matches']
+        chapter_name = self.chapter_name(chapter_number)
+        return chapter_cache.get_or_load(
+            (book_title, chapter_name),
+            lambda: self._load_chapter(book_title, chapter_name)
+        )
+
+    @staticmethod
+    def chapter_name(chapter_number: str) -> str:
+        """Chapter name as stored at ingest (whitespace-normalized heading)"""
+        return " ".join(f"Chapter {chapter_number.title()}".split())
+
+    @staticmethod
+    def _chapter_filter(chapter_name: str) -> dict:
+        """
+        Index filter for a chapter. Books ingested before headings were
+        normalized are stored under PyPDF2's "Chapter  One" spelling until
+        they are re-ingested, so that spelling matches too.
+        """
+        return {"$in": [chapter_name, chapter_name.replace(" ", "  ", 1)]}
+
+    def _load_chapter(self, book_title: str, chapter_name: str) -> str:
+        chunks = self.chapter_store.get_chunks(book_title, chapter_name)
+        if not chunks:
+            chunks = self._backfill_chapter(book_title, chapter_name)
         
         if not chunks:
             available = self.list_available_chapters(book_title)
@@ -26,13 +60,100 @@ class ChapterRetriever:
                 f"{available}"
             )
         
+        return "\n\n".join(chunks)
+
+    def _backfill_chapter(self, book_title: str, chapter_name: str) -> list:
+        """
+        Rebuild a chapter ingested before the local chapter store existed from
+        the vector index, and keep it locally for next time
+        """
+        chunks = self.embeddings_manager.index.query(
+            vector=[0]*Config.EMBEDDING_DIMENSION,
+            top_k=10000,
+            filter={
+                "book": {"$eq": book_title},
+                "chapter": self._chapter_filter(chapter_name)
+            },
+            include_metadata=True
+        )['matches']
+        
         sorted_chunks = sorted(chunks, key=lambda x: x['metadata']['chunk_index'])
-        return "\n\n".join([chunk['metadata']['text'] for chunk in sorted_chunks])
+        texts = [chunk['metadata']['text'] for chunk in sorted_chunks]
+        if texts:
+            self.chapter_store.save_chapter(book_title, chapter_name, texts)
+        return texts
+
+    def get_relevant_chunks(self, book_title: str, chapter_number: str, weaknesses: List[str],
+                            strengths: List[str] = None, top_k: int = None,
+                            query_vectors: np.ndarray = None) -> List[str]:
+        """
+        Top-k chunks of a chapter most relevant to the student's weaknesses and
+        least to their strengths, returned in reading order. query_vectors are
+        the weaknesses' then strengths' vectors from encode_focus, if the
+        caller already has them.
+        """
+        chapter_name = self.chapter_name(chapter_number)
+        top_k = top_k or Config.RETRIEVAL_TOP_K
+        strengths = strengths or []
+        
+        if query_vectors is None:
+            query_vectors = self.encode_focus(weaknesses, strengths)
+        weakness_vectors = query_vectors[:len(weaknesses)]
+        strength_vectors = query_vectors[len(weaknesses):]
+        
+        candidates = {}
+        for vector in weakness_vectors:
+            matches = self.embeddings_manager.index.query(
+                vector=vector.tolist(),
+                top_k=Config.RETRIEVAL_CANDIDATES_PER_QUERY,
+                filter={
+                    "book": {"$eq": book_title},
+                    "chapter": self._chapter_filter(chapter_name)
+                },
+                include_values=True,
+                include_metadata=True
+            )['matches']
+            for match in matches:
+                candidates[match['id']] = match
+        
+        if not candidates:
+            return []
+        
+        matches = list(candidates.values())
+        chunk_vectors = self.normalize(np.array([match['values'] for match in matches], dtype=np.float32))
+        scores = (chunk_vectors @ weakness_vectors.T).max(axis=1)
+        if len(strength_vectors):
+            scores -= Config.RETRIEVAL_STRENGTH_PENALTY * (chunk_vectors @ strength_vectors.T).max(axis=1)
+        
+        best = [matches[i] for i in np.argsort(-scores, kind='stable')[:top_k]]
+        best.sort(key=lambda match: match['metadata']['chunk_index'])
+        return [match['metadata']['text'] for match in best]
+
+    def encode_focus(self, weaknesses: List[str], strengths: List[str] = None) -> np.ndarray:
+        """Normalized vectors of the weaknesses followed by the strengths, in one batch"""
+        return self.normalize(self.embeddings_manager.encode_chunks(list(weaknesses) + list(strengths or [])))
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalize each row so dot products are cosine similarities"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
 
     def list_available_chapters(self, book_title: str) -> list:
-        """Lists chapters in nice format (removes double space)"""
+        """Lists chapters as the numbers/words accepted by get_full_chapter"""
+        return chapter_list_cache.get_or_load(
+            (book_title, 'retriever'),
+            lambda: self._list_chapters(book_title)
+        )
+
+    def _list_chapters(self, book_title: str) -> list:
+        catalog = self.embeddings_manager.catalog
+        if catalog.has_book(book_title):
+            return [chapter.split()[-1] for chapter in catalog.chapters(book_title)]
+        
+        # Books ingested before the catalog existed can only be found by scanning the index
         results = self.embeddings_manager.index.query(
-            vector=[0]*384,
+            vector=[0]*Config.EMBEDDING_DIMENSION,
             top_k=10000,
             filter={"book": {"$eq": book_title}},
             include_metadata=True
@@ -44,10 +165,7 @@ class ChapterRetriever:
             if chapter:
                 chapters.add(chapter.split()[-1])
                 
-        number_words = ['One', 'Two', 'Three', 'Four', 'Five',
-                       'Six', 'Seven', 'Eight', 'Nine', 'Ten',
-                       'Eleven', 'Twelve']
-        return [ch for ch in number_words if ch in chapters]
+        return sorted(chapters, key=_chapter_order)
     
 # retriever = ChapterRetriever()
 
@@ -1,9 +1,6 @@
 import logging
 from paper_reviewer import ExamPaperReviewer
 
-logging.basicConfig(level=logging.INFO)
-reviewer = ExamPaperReviewer()
-
 exam_paper = [
     {
         "question": "Explain the difference between mitosis and meiosis.",
@@ -19,54 +16,57 @@ exam_paper = [
     }
 ]
 
-try:
-    results = reviewer.review_exam_paper(exam_paper)
-    
-    print("\n=== EXAM PAPER REVIEW RESULTS ===\n")
-    
-    print(f"OVERALL SCORE: {results['overall_score']}%")
-    print(f"Total Marks: {sum(q['marks_awarded'] for q in results['questions'])}/{sum(q['marks'] for q in exam_paper)}")
-    print("\n")
-    
-    for i, (q_result, q_original) in enumerate(zip(results['questions'], exam_paper)):
-        print(f"QUESTION {i+1}: {q_original['question']}")
-        print(f"Score: {q_result['score']}%")
-        print(f"Marks: {q_result['marks_awarded']}/{q_original['marks']}")
-        
-        print("\nStrengths:")
-        for strength in (q_result['strengths'] or ["No specific strengths identified"]):
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    reviewer = ExamPaperReviewer()
+
+    try:
+        results = reviewer.review_exam_paper(exam_paper)
+
+        print("\n=== EXAM PAPER REVIEW RESULTS ===\n")
+
+        print(f"OVERALL SCORE: {results['overall_score']}%")
+        print(f"Total Marks: {sum(q['marks_awarded'] for q in results['questions'])}/{sum(q['marks'] for q in exam_paper)}")
+        print("\n")
+
+        for i, (q_result, q_original) in enumerate(zip(results['questions'], exam_paper)):
+            print(f"QUESTION {i+1}: {q_original['question']}")
+            print(f"Score: {q_result['score']}%")
+            print(f"Marks: {q_result['marks_awarded']}/{q_original['marks']}")
+
+            print("\nStrengths:")
+            for strength in (q_result['strengths'] or ["No specific strengths identified"]):
+                print(f"- {strength}")
+
+            print("\nAreas for Improvement:")
+            for weakness in (q_result['weaknesses'] or ["No specific weaknesses identified"]):
+                print(f"- {weakness}")
+
+            print("\nSuggestions:")
+            for suggestion in (q_result['suggestions'] or ["No specific suggestions provided"]):
+                print(f"- {suggestion}")
+
+            print("\nDetailed Feedback:")
+            print(q_result['detailed_feedback'])
+            print("\n" + "="*80 + "\n")
+
+        print("\nSUMMARY FEEDBACK")
+        print("\nKey Strengths:")
+        for strength in (results['feedback_summary']['strengths'] or ["No overall strengths identified"]):
             print(f"- {strength}")
-            
-        print("\nAreas for Improvement:")
-        for weakness in (q_result['weaknesses'] or ["No specific weaknesses identified"]):
+
+        print("\nMain Weaknesses:")
+        for weakness in (results['feedback_summary']['weaknesses'] or ["No overall weaknesses identified"]):
             print(f"- {weakness}")
-            
-        print("\nSuggestions:")
-        for suggestion in (q_result['suggestions'] or ["No specific suggestions provided"]):
+
+        print("\nTop Suggestions:")
+        for suggestion in (results['feedback_summary']['suggestions'] or ["No overall suggestions provided"]):
             print(f"- {suggestion}")
-        
-        print("\nDetailed Feedback:")
-        print(q_result['detailed_feedback'])
-        print("\n" + "="*80 + "\n")
-    
-    print("\nSUMMARY FEEDBACK")
-    print("\nKey Strengths:")
-    for strength in (results['feedback_summary']['strengths'] or ["No overall strengths identified"]):
-        print(f"- {strength}")
-        
-    print("\nMain Weaknesses:")
-    for weakness in (results['feedback_summary']['weaknesses'] or ["No overall weaknesses identified"]):
-        print(f"- {weakness}")
-        
-    print("\nTop Suggestions:")
-    for suggestion in (results['feedback_summary']['suggestions'] or ["No overall suggestions provided"]):
-        print(f"- {suggestion}")
-
-except Exception as e:
-    print(f"\nError occurred during paper review: {str(e)}")
-    
-    
-    
+
+    except Exception as e:
+        print(f"\nError occurred during paper review: {str(e)}")
+
+
 
 """ 
 === EXAM PAPER REVIEW RESULTS ===
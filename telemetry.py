@@ -0,0 +1,177 @@
+# telemetry.py
+"""
+In-process instrumentation: stage timings (spans), LLM token usage and cache
+hit/miss counts. Everything is aggregated in memory and can be exported as
+Prometheus text, served on TELEMETRY_PORT, and/or appended event by event to
+TELEMETRY_JSONL_PATH.
+
+    with telemetry.span("qgen.retrieval", component="question_generator"):
+        ...
+    telemetry.record_usage("question_generator", completion.usage)
+    telemetry.record_cache("question_chunks", hit=True)
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, Tuple
+from config import Config
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Telemetry:
+    def __init__(self, jsonl_path: str = None, buckets: Tuple[float, ...] = None):
+        self.logger = logging.getLogger(__name__)
+        self.jsonl_path = jsonl_path if jsonl_path is not None else Config.TELEMETRY_JSONL_PATH
+        self.buckets = tuple(buckets or Config.TELEMETRY_BUCKETS)
+        self._lock = threading.Lock()
+        self._spans: Dict[Tuple[str, Labels], list] = {}
+        self._tokens: Dict[Tuple[str, str], int] = {}
+        self._cache: Dict[Tuple[str, str], int] = {}
+        self._collectors: Dict[str, Callable[[], Dict]] = {}
+        self._server = None
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[None]:
+        """Time the enclosed block and record it under name and labels"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(name, time.perf_counter() - start, **labels)
+
+    def record_span(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            entry = self._spans.get(key)
+            if entry is None:
+                entry = self._spans[key] = [0, 0.0, [0] * len(self.buckets)]
+            entry[0] += 1
+            entry[1] += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry[2][i] += 1
+        self._emit({"type": "span", "name": name, "seconds": round(seconds, 6), **labels})
+
+    def record_usage(self, component: str, usage):
+        """Add the prompt/completion token counts of an OpenAI-style usage object"""
+        if usage is None:
+            return
+        counts = {
+            "prompt": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion": getattr(usage, "completion_tokens", 0) or 0
+        }
+        with self._lock:
+            for kind, count in counts.items():
+                self._tokens[(component, kind)] = self._tokens.get((component, kind), 0) + count
+        self._emit({"type": "usage", "component": component,
+                    "prompt_tokens": counts["prompt"], "completion_tokens": counts["completion"]})
+
+    def record_cache(self, cache: str, hit: bool):
+        result = "hit" if hit else "miss"
+        with self._lock:
+            self._cache[(cache, result)] = self._cache.get((cache, result), 0) + 1
+
+    def register_collector(self, name: str, stats: Callable[[], Dict]):
+        """Expose a cache's own stats() (hits, misses, evictions, ...) as gauges"""
+        with self._lock:
+            self._collectors[name] = stats
+
+    def cache_hit_ratios(self) -> Dict[str, float]:
+        with self._lock:
+            names = {cache for cache, _ in self._cache}
+            return {
+                name: self._cache.get((name, "hit"), 0)
+                / max(1, self._cache.get((name, "hit"), 0) + self._cache.get((name, "miss"), 0))
+                for name in names
+            }
+
+    def prometheus_text(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = [
+            "# HELP learnbuddy_stage_seconds Time spent per instrumented stage",
+            "# TYPE learnbuddy_stage_seconds histogram"
+        ]
+        with self._lock:
+            spans = {key: (count, total, list(buckets)) for key, (count, total, buckets) in self._spans.items()}
+            tokens = dict(self._tokens)
+            cache = dict(self._cache)
+            collectors = dict(self._collectors)
+
+        for (name, labels), (count, total, buckets) in sorted(spans.items()):
+            base = (("stage", name),) + labels
+            for bound, bucket_count in zip(self.buckets, buckets):
+                lines.append(f"learnbuddy_stage_seconds_bucket{self._labels(base + (('le', repr(bound)),))} {bucket_count}")
+            lines.append(f"learnbuddy_stage_seconds_bucket{self._labels(base + (('le', '+Inf'),))} {count}")
+            lines.append(f"learnbuddy_stage_seconds_sum{self._labels(base)} {total:.6f}")
+            lines.append(f"learnbuddy_stage_seconds_count{self._labels(base)} {count}")
+
+        lines += ["# HELP learnbuddy_llm_tokens_total LLM tokens consumed",
+                  "# TYPE learnbuddy_llm_tokens_total counter"]
+        for (component, kind), count in sorted(tokens.items()):
+            lines.append(f"learnbuddy_llm_tokens_total{self._labels((('component', component), ('kind', kind)))} {count}")
+
+        lines += ["# HELP learnbuddy_cache_requests_total Cache lookups by result",
+                  "# TYPE learnbuddy_cache_requests_total counter"]
+        for (name, result), count in sorted(cache.items()):
+            lines.append(f"learnbuddy_cache_requests_total{self._labels((('cache', name), ('result', result)))} {count}")
+
+        lines += ["# HELP learnbuddy_cache_stat In-process cache statistics",
+                  "# TYPE learnbuddy_cache_stat gauge"]
+        for name, stats in sorted(collectors.items()):
+            for stat, value in sorted(stats().items()):
+                lines.append(f"learnbuddy_cache_stat{self._labels((('cache', name), ('stat', stat)))} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = None, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve /metrics on a daemon thread (once per process)"""
+        if self._server is not None:
+            return self._server
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = telemetry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port or Config.TELEMETRY_PORT), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.logger.info(f"Serving metrics on http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server
+
+    def _emit(self, event: Dict):
+        if not self.jsonl_path:
+            return
+        line = json.dumps({"ts": time.time(), **event}, ensure_ascii=False)
+        with self._lock:
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    @staticmethod
+    def _labels(labels: Labels) -> str:
+        escaped = (
+            key + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            for key, value in labels
+        )
+        return "{" + ",".join(escaped) + "}"
+
+# Process-wide instance every module records into
+telemetry = Telemetry()
+
+def start_exporter():
+    """Start the metrics endpoint if TELEMETRY_PORT is configured"""
+    if Config.TELEMETRY_PORT:
+        telemetry.serve(Config.TELEMETRY_PORT)
@@ -0,0 +1,92 @@
+# token_counter.py
+import logging
+import math
+import threading
+from typing import List
+import numpy as np
+from config import Config
+from fingerprint import stable_hash
+from ttl_cache import TTLCache
+
+def estimate_token_counts(texts: List[str]) -> np.ndarray:
+    """
+    Deterministic words x 1.33 token estimate. Anything that feeds content
+    fingerprints (ingest chunk boundaries) must use this rather than the
+    tokenizer, whose availability varies between machines and runs.
+    """
+    return np.array([math.ceil(len(text.split()) * 1.33) for text in texts], dtype=np.int64)
+
+class TokenCounter:
+    """
+    Counts tokens with the LLM's own tokenizer, loaded once per process.
+    Counts are memoized by content hash, and many texts can be counted in a
+    single batched tokenizer call. If the tokenizer can't be loaded (e.g.
+    offline) it falls back to the old words x 1.33 estimate. Meant for prompt
+    budgeting only; see estimate_token_counts for chunking.
+    """
+
+    def __init__(self, tokenizer_name: str = None):
+        self.tokenizer_name = tokenizer_name or Config.TOKENIZER_MODEL
+        self.logger = logging.getLogger(__name__)
+        self._tokenizer = None
+        self._tokenizer_loaded = False
+        self._load_lock = threading.Lock()
+        self._counts = TTLCache(Config.TOKEN_COUNT_CACHE_SIZE, math.inf, weigh=lambda value: 1)
+
+    @property
+    def tokenizer(self):
+        if not self._tokenizer_loaded:
+            with self._load_lock:
+                if not self._tokenizer_loaded:
+                    try:
+                        from transformers import AutoTokenizer
+                        self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+                    except Exception as e:
+                        self.logger.warning(
+                            f"Could not load tokenizer '{self.tokenizer_name}', estimating tokens from words: {str(e)}"
+                        )
+                    self._tokenizer_loaded = True
+        return self._tokenizer
+
+    def count(self, text: str) -> int:
+        return int(self.count_many([text])[0])
+
+    def count_many(self, texts: List[str]) -> np.ndarray:
+        """Token counts for many texts, tokenizing only the ones not seen before in one batch"""
+        counts = np.zeros(len(texts), dtype=np.int64)
+        keys = [stable_hash(text, self.tokenizer_name) for text in texts]
+
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self._counts.get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                counts[i] = cached
+
+        if missing:
+            fresh = self._tokenize_counts([texts[i] for i in missing])
+            for i, count in zip(missing, fresh):
+                counts[i] = count
+                self._counts.set(keys[i], int(count))
+
+        return counts
+
+    def _tokenize_counts(self, texts: List[str]) -> np.ndarray:
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return estimate_token_counts(texts)
+        encoded = tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return np.fromiter((len(ids) for ids in encoded), dtype=np.int64, count=len(texts))
+
+_shared_counter = None
+_shared_lock = threading.Lock()
+
+def get_token_counter() -> TokenCounter:
+    """Process-wide token counter so the tokenizer is loaded at most once"""
+    global _shared_counter
+    if _shared_counter is None:
+        with _shared_lock:
+            if _shared_counter is None:
+                _shared_counter = TokenCounter()
+    return _shared_counter
@@ -0,0 +1,116 @@
+# ttl_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+from config import Config
+from telemetry import telemetry
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache with a per-entry time-to-live and a
+    bound on both entry count and total weight (characters, by default)
+    """
+
+    def __init__(self, max_entries: int, ttl: float, max_weight: int = None,
+                 weigh: Callable[[Any], int] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: len(value) if hasattr(value, '__len__') else 1)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._weight = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        weight = self.weigh(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl, weight)
+            self._weight += weight
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_weight is not None and self._weight > self.max_weight)
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value or compute, store and return it"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches the predicate"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "weight": self._weight
+            }
+
+    def _remove(self, key: Hashable):
+        _, _, weight = self._entries.pop(key)
+        self._weight -= weight
+
+# Process-wide caches for assembled chapter text and chapter listings, keyed
+# by tuples whose first element is the book title
+chapter_cache = TTLCache(
+    Config.CHAPTER_CACHE_MAX_ENTRIES,
+    Config.CHAPTER_CACHE_TTL,
+    max_weight=Config.CHAPTER_CACHE_MAX_CHARS
+)
+chapter_list_cache = TTLCache(Config.CHAPTER_LIST_CACHE_MAX_ENTRIES, Config.CHAPTER_CACHE_TTL, weigh=lambda value: 1)
+telemetry.register_collector("chapter_cache", chapter_cache.stats)
+telemetry.register_collector("chapter_list_cache", chapter_list_cache.stats)
+
+def invalidate_book(book_title: str):
+    """Drop cached chapters and listings for a book after it has been (re-)ingested"""
+    chapter_cache.invalidate_where(lambda key: key[0] == book_title)
+    chapter_list_cache.invalidate_where(lambda key: key[0] in (book_title, None))
@@ -0,0 +1,326 @@
+# vector_store.py
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Set
+import numpy as np
+from config import Config
+
+class LocalVectorIndex:
+    """
+    In-process stand-in for a Pinecone index, implementing the part of its API
+    the app uses: upsert, fetch, update, delete, list and query with metadata
+    filters. Vectors are stored unit-normalized in a memory-mapped float32
+    matrix, so query scores are cosine similarities and fetched values come
+    back normalized. Ids and metadata live in a SQLite sidecar mirrored in
+    memory.
+
+    Search is exact by default. With faiss installed, "ivf" or "hnsw" search
+    is used for queries whose filter leaves more than LOCAL_INDEX_EXACT_MAX
+    candidates; small filtered queries (one chapter, one book) stay exact.
+    """
+
+    INDEXED_FIELDS = ("book", "chapter")
+
+    def __init__(self, path: str = None, dimension: int = None, search: str = None):
+        self.path = path or Config.LOCAL_INDEX_PATH
+        self.dimension = dimension or Config.EMBEDDING_DIMENSION
+        self.search = (search or Config.LOCAL_INDEX_SEARCH).lower()
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        os.makedirs(self.path, exist_ok=True)
+        if self.search in ("ivf", "hnsw") and self._faiss() is None:
+            self.logger.warning(f"faiss is not installed, local index search '{self.search}' falls back to exact")
+
+        self.conn = sqlite3.connect(os.path.join(self.path, "metadata.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS vectors (
+                id TEXT PRIMARY KEY,
+                row INTEGER NOT NULL UNIQUE,
+                metadata TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+        self._matrix_path = os.path.join(self.path, "vectors.f32")
+        self._ids: Dict[str, int] = {}
+        self._row_ids: Dict[int, str] = {}
+        self._metadata: Dict[int, Dict] = {}
+        self._postings: Dict[tuple, Set[int]] = {}
+        for vector_id, row, metadata in self.conn.execute("SELECT id, row, metadata FROM vectors"):
+            self._track(vector_id, row, json.loads(metadata))
+
+        self._capacity = 0
+        self._matrix = None
+        self._open_matrix(max(self._row_ids, default=-1) + 1)
+        used = set(self._row_ids)
+        self._free_rows = [row for row in range(max(used, default=-1) + 1) if row not in used]
+        self._next_row = max(used, default=-1) + 1
+        self._ann = None
+
+    # Pinecone-compatible API
+
+    def upsert(self, vectors: List, namespace: str = None) -> Dict[str, int]:
+        records = [self._as_record(vector) for vector in vectors]
+        with self._lock:
+            rows = []
+            for vector_id, values, metadata in records:
+                row = self._ids.get(vector_id)
+                if row is None:
+                    row = self._allocate_row()
+                else:
+                    self._untrack(vector_id, row)
+                self._matrix[row] = self._normalize(np.asarray(values, dtype=np.float32))
+                self._track(vector_id, row, metadata)
+                rows.append((vector_id, row, json.dumps(metadata, ensure_ascii=False)))
+            self._matrix.flush()
+            self.conn.executemany("INSERT OR REPLACE INTO vectors (id, row, metadata) VALUES (?, ?, ?)", rows)
+            self.conn.commit()
+            self._ann = None
+        return {"upserted_count": len(records)}
+
+    def fetch(self, ids: List[str], namespace: str = None) -> SimpleNamespace:
+        with self._lock:
+            vectors = {
+                vector_id: SimpleNamespace(
+                    id=vector_id,
+                    values=self._matrix[self._ids[vector_id]].tolist(),
+                    metadata=dict(self._metadata[self._ids[vector_id]])
+                )
+                for vector_id in ids if vector_id in self._ids
+            }
+        return SimpleNamespace(vectors=vectors, namespace=namespace or "")
+
+    def update(self, id: str, values: List[float] = None, set_metadata: Dict = None, namespace: str = None):
+        with self._lock:
+            row = self._ids.get(id)
+            if row is None:
+                return
+            metadata = dict(self._metadata[row])
+            metadata.update(set_metadata or {})
+            if values is None:
+                values = self._matrix[row]
+            self.upsert(vectors=[{"id": id, "values": values, "metadata": metadata}])
+
+    def delete(self, ids: List[str] = None, delete_all: bool = False, filter: Dict = None, namespace: str = None):
+        with self._lock:
+            if delete_all:
+                ids = list(self._ids)
+            elif filter is not None:
+                ids = [self._row_ids[row] for row in self._filter_rows(filter)]
+            ids = [vector_id for vector_id in ids or [] if vector_id in self._ids]
+            for vector_id in ids:
+                row = self._ids[vector_id]
+                self._untrack(vector_id, row)
+                self._matrix[row] = 0
+                self._free_rows.append(row)
+            self.conn.executemany("DELETE FROM vectors WHERE id = ?", [(vector_id,) for vector_id in ids])
+            self.conn.commit()
+            if ids:
+                self._ann = None
+
+    def list(self, prefix: str = None, limit: int = 100, namespace: str = None) -> Iterator[List[str]]:
+        """Yield pages of ids, like Pinecone's list() on serverless indexes"""
+        with self._lock:
+            ids = sorted(vector_id for vector_id in self._ids if not prefix or vector_id.startswith(prefix))
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def query(self, vector: List[float] = None, top_k: int = 10, filter: Dict = None,
+              include_values: bool = False, include_metadata: bool = False,
+              id: str = None, namespace: str = None) -> Dict[str, List[Dict]]:
+        with self._lock:
+            if id is not None:
+                if id not in self._ids:
+                    return {"matches": []}
+                query = np.array(self._matrix[self._ids[id]])
+            else:
+                query = self._normalize(np.asarray(vector, dtype=np.float32))
+
+            rows = self._filter_rows(filter)
+            if self._use_ann(len(rows)):
+                rows, scores = self._ann_search(query, top_k, rows)
+            else:
+                rows, scores = self._exact_search(query, top_k, rows)
+
+            matches = []
+            for row, score in zip(rows, scores):
+                match = {"id": self._row_ids[row], "score": float(score)}
+                if include_values:
+                    match["values"] = self._matrix[row].tolist()
+                if include_metadata:
+                    match["metadata"] = dict(self._metadata[row])
+                matches.append(match)
+        return {"matches": matches}
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"dimension": self.dimension, "total_vector_count": len(self._ids)}
+
+    # Search
+
+    def _exact_search(self, query: np.ndarray, top_k: int, rows: np.ndarray):
+        if not len(rows) or top_k <= 0:
+            return [], []
+        scores = self._matrix[rows] @ query
+        if len(rows) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(rows))
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return rows[best].tolist(), scores[best].tolist()
+
+    def _use_ann(self, candidates: int) -> bool:
+        return self.search in ("ivf", "hnsw") and candidates > Config.LOCAL_INDEX_EXACT_MAX and self._faiss() is not None
+
+    def _ann_search(self, query: np.ndarray, top_k: int, rows: np.ndarray):
+        if self._ann is None:
+            self._ann = self._build_ann()
+        allowed = set(rows.tolist())
+        # Oversample so enough hits survive the metadata filter
+        k = min(len(self._ids), top_k * Config.LOCAL_INDEX_OVERSAMPLE)
+        scores, hits = self._ann.search(query.reshape(1, -1), k)
+        found = [(int(row), float(score)) for row, score in zip(hits[0], scores[0])
+                 if row >= 0 and int(row) in allowed][:top_k]
+        if len(found) < min(top_k, len(rows)):
+            return self._exact_search(query, top_k, rows)
+        return [row for row, _ in found], [score for _, score in found]
+
+    def _build_ann(self):
+        faiss = self._faiss()
+        rows = np.array(sorted(self._row_ids), dtype=np.int64)
+        data = np.ascontiguousarray(self._matrix[rows])
+        if self.search == "hnsw":
+            base = faiss.IndexHNSWFlat(self.dimension, Config.LOCAL_INDEX_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        else:
+            lists = max(1, min(Config.LOCAL_INDEX_IVF_LISTS, int(math.sqrt(len(rows)))))
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            base = faiss.IndexIVFFlat(quantizer, self.dimension, lists, faiss.METRIC_INNER_PRODUCT)
+            base.train(data)
+            base.nprobe = min(Config.LOCAL_INDEX_IVF_PROBES, lists)
+        ann = faiss.IndexIDMap(base)
+        ann.add_with_ids(data, rows)
+        return ann
+
+    @staticmethod
+    def _faiss():
+        try:
+            import faiss
+            return faiss
+        except ImportError:
+            return None
+
+    # Filters
+
+    def _filter_rows(self, filter: Optional[Dict]) -> np.ndarray:
+        """Rows whose metadata matches a Pinecone-style filter"""
+        if not filter:
+            return np.array(sorted(self._row_ids), dtype=np.int64)
+
+        candidates = None
+        for field, condition in filter.items():
+            if field in self.INDEXED_FIELDS:
+                value = condition.get("$eq") if isinstance(condition, dict) else condition
+                if value is not None:
+                    posting = self._postings.get((field, value), set())
+                    candidates = posting if candidates is None else candidates & posting
+        if candidates is None:
+            candidates = self._row_ids.keys()
+
+        return np.array(
+            sorted(row for row in candidates if self._matches(self._metadata[row], filter)),
+            dtype=np.int64
+        )
+
+    @classmethod
+    def _matches(cls, metadata: Dict, filter: Dict) -> bool:
+        for field, condition in filter.items():
+            if field == "$and":
+                if not all(cls._matches(metadata, sub) for sub in condition):
+                    return False
+                continue
+            if field == "$or":
+                if not any(cls._matches(metadata, sub) for sub in condition):
+                    return False
+                continue
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(field)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+                if op in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if ((op == "$gt" and not value > operand) or (op == "$gte" and not value >= operand)
+                            or (op == "$lt" and not value < operand) or (op == "$lte" and not value <= operand)):
+                        return False
+        return True
+
+    # Storage
+
+    def _open_matrix(self, rows: int):
+        """Map the vector file, growing it to hold at least `rows` rows"""
+        row_bytes = self.dimension * np.dtype(np.float32).itemsize
+        size = os.path.getsize(self._matrix_path) if os.path.exists(self._matrix_path) else 0
+        capacity = size // row_bytes
+        if capacity < max(rows, 1):
+            capacity = max(rows, capacity * 2, Config.LOCAL_INDEX_INITIAL_CAPACITY)
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            with open(self._matrix_path, 'ab') as f:
+                f.truncate(capacity * row_bytes)
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode='r+', shape=(capacity, self.dimension))
+        self._capacity = capacity
+
+    def _allocate_row(self) -> int:
+        if self._free_rows:
+            return self._free_rows.pop()
+        row = self._next_row
+        self._next_row += 1
+        if row >= self._capacity:
+            self._open_matrix(row + 1)
+        return row
+
+    def _track(self, vector_id: str, row: int, metadata: Dict):
+        self._ids[vector_id] = row
+        self._row_ids[row] = vector_id
+        self._metadata[row] = metadata
+        for field in self.INDEXED_FIELDS:
+            if field in metadata:
+                self._postings.setdefault((field, metadata[field]), set()).add(row)
+
+    def _untrack(self, vector_id: str, row: int):
+        metadata = self._metadata.pop(row, {})
+        for field in self.INDEXED_FIELDS:
+            if field in metadata:
+                self._postings.get((field, metadata[field]), set()).discard(row)
+        self._ids.pop(vector_id, None)
+        self._row_ids.pop(row, None)
+
+    def _as_record(self, vector) -> tuple:
+        if isinstance(vector, dict):
+            values, metadata = vector["values"], vector.get("metadata") or {}
+            vector_id = vector["id"]
+        else:
+            vector_id, values, metadata = (tuple(vector) + ({},))[:3]
+        if len(values) != self.dimension:
+            raise ValueError(f"Vector '{vector_id}' has dimension {len(values)}, expected {self.dimension}")
+        return vector_id, values, metadata
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
@@ -0,0 +1,136 @@
+# warmup_bank.py
+"""
+Pre-generate pools of MCQ and written questions for every ingested chapter
+chunk and store them in the question bank, so interactive requests are
+answered from the bank instead of waiting on the LLM. Run after ingest.py.
+
+Progress lives in the bank itself: a rerun only tops up chunks whose pool of
+not-yet-served questions is short (so pools drained by requests are refilled),
+and questions of chunks that were re-ingested away are pruned.
+All calls go through the shared LLM scheduler, so LLM_REQUESTS_PER_MINUTE
+and LLM_TOKENS_PER_MINUTE apply.
+
+    python warmup_bank.py [--books chemistry9_10] [--max-calls 200] [--max-tokens 0]
+"""
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, NamedTuple
+from chapter_catalog import ChapterCatalog
+from chapter_store import ChapterStore
+from fingerprint import chunk_hash
+from llm_scheduler import get_scheduler
+from question_bank import QuestionBank
+from question_generator import QuestionGenerator
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class WarmupJob(NamedTuple):
+    book: str
+    chapter: str
+    question_type: str
+    chunk: str
+    chunk_hash: str
+    num_questions: int
+
+def plan_jobs(bank: QuestionBank, chapter_store: ChapterStore, catalog: ChapterCatalog,
+              books: List[str], question_types: List[str], stats: Dict[str, int]) -> List[WarmupJob]:
+    """One job per chunk and type whose pool of unserved questions is below WARMUP_POOL_SIZE"""
+    jobs = []
+    for book in books:
+        for chapter in catalog.chapters(book):
+            chunks = chapter_store.get_chunks(book, chapter)
+            hashes = [chunk_hash(chunk) for chunk in chunks]
+            stats["pruned"] += bank.prune_stale(book, chapter, hashes)
+            for question_type in question_types:
+                # Pools are sized for the shared (anonymous) history, so served questions get topped up
+                banked = bank.count_by_chunk(book, chapter, question_type, learner="")
+                for chunk, fingerprint in zip(chunks, hashes):
+                    missing = Config.WARMUP_POOL_SIZE[question_type] - banked.get(fingerprint, 0)
+                    if missing > 0:
+                        jobs.append(WarmupJob(book, chapter, question_type, chunk, fingerprint, missing))
+                    else:
+                        stats["full"] += 1
+    return jobs
+
+def run_job(generator: QuestionGenerator, bank: QuestionBank, job: WarmupJob) -> int:
+    # A top-up must not pay for questions the pool already has (the cached ones included)
+    banked = bank.chunk_questions(job.book, job.chapter, job.question_type, job.chunk_hash)
+    questions = generator.generate_questions(job.chunk, job.question_type, job.num_questions,
+                                             exclude=banked, use_cache=not banked)
+    if not questions:
+        return 0
+    try:
+        embeddings = generator.embed_questions([q['question'] for q in questions])
+    except Exception as e:
+        logger.warning(f"Could not embed questions for the question bank: {str(e)}")
+        embeddings = None
+    bank.add_questions(job.book, job.chapter, job.question_type, questions,
+                       [job.chunk_hash] * len(questions), embeddings=embeddings)
+    return len(questions)
+
+def warm_up(books: List[str] = None, question_types: List[str] = None, max_calls: int = None,
+            max_tokens: int = 0, workers: int = None) -> Dict[str, int]:
+    """Fill the question bank within a budget of LLM calls and (estimated) tokens"""
+    bank = QuestionBank()
+    chapter_store = ChapterStore()
+    catalog = ChapterCatalog()
+    generator = QuestionGenerator()
+    question_types = question_types or list(Config.WARMUP_POOL_SIZE)
+    max_calls = Config.WARMUP_MAX_CALLS if max_calls is None else max_calls
+    stats = {"jobs": 0, "full": 0, "pruned": 0, "generated": 0, "failed": 0, "deferred": 0, "estimated_tokens": 0}
+
+    jobs = plan_jobs(bank, chapter_store, catalog, books or catalog.books(), question_types, stats)
+    budgeted = []
+    for job in jobs:
+        tokens = generator.estimate_call_tokens(job.chunk, job.question_type, job.num_questions)
+        if len(budgeted) >= max_calls or (max_tokens and stats["estimated_tokens"] + tokens > max_tokens):
+            break
+        budgeted.append(job)
+        stats["estimated_tokens"] += tokens
+    stats["jobs"] = len(budgeted)
+    stats["deferred"] = len(jobs) - len(budgeted)
+
+    executor = ThreadPoolExecutor(max_workers=workers or Config.MAX_WORKERS)
+    try:
+        futures = {executor.submit(run_job, generator, bank, job): job for job in budgeted}
+        for done, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            try:
+                stats["generated"] += future.result()
+            except Exception as e:
+                stats["failed"] += 1
+                logger.warning(f"Warmup failed for {job.book} / {job.chapter} ({job.question_type}): {str(e)}")
+            if done % 10 == 0 or done == len(budgeted):
+                print(f"  {done}/{len(budgeted)} chunk pools filled, {stats['generated']} questions banked")
+    finally:
+        # On Ctrl+C, drop queued jobs; everything already banked counts towards the next run
+        executor.shutdown(wait=True, cancel_futures=True)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate question pools for every ingested chapter chunk")
+    parser.add_argument("--books", nargs="+", help="Only these books (default: every book in the catalog)")
+    parser.add_argument("--types", nargs="+", choices=list(Config.WARMUP_POOL_SIZE), help="Question types to warm up")
+    parser.add_argument("--max-calls", type=int, default=Config.WARMUP_MAX_CALLS,
+                        help="Most chunk pools to generate in this run")
+    parser.add_argument("--max-tokens", type=int, default=0,
+                        help="Estimated prompt + completion token budget for this run (0 = no limit)")
+    parser.add_argument("--workers", type=int, default=Config.MAX_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print("Question Bank Warmup")
+    print("--------------------")
+    stats = warm_up(args.books, args.types, args.max_calls, args.max_tokens, args.workers)
+    scheduler = get_scheduler().stats
+    print(f"\nGenerated {stats['generated']} questions in {stats['jobs']} chunk pools "
+          f"(~{stats['estimated_tokens']} tokens budgeted)")
+    print(f"{stats['full']} pools already full, {stats['pruned']} stale questions pruned")
+    print(f"LLM retries: {scheduler['retries']}, throttled for {scheduler['throttled_seconds']:.1f}s")
+    if stats["failed"] or stats["deferred"]:
+        print(f"{stats['failed']} pools failed and {stats['deferred']} are over budget; rerun to continue")
+
+if __name__ == "__main__":
+    main()